@@ -0,0 +1,157 @@
+"""Batch backtests over a universe of symbols, intervals and strategies"""
+
+import contextlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+ROW_FORMAT = "%-12s %-5s %-18s %9s %10s %9s %9s %9s %8s"
+
+
+def _run_job(args, symbol, interval, strategy_name, params):
+    from main import BacktestRunner, DataHandler
+
+    runner = BacktestRunner(args, strategy_name, params)
+    runner.data_handler = DataHandler(
+        symbol=symbol,
+        interval=interval,
+        base_interval=args.base_interval,
+        compact=args.compact,
+    )
+    if args.low_memory:
+        runner.setup_cerebro(runner.data_handler.iter_cached)
+    else:
+        runner.setup_cerebro(runner.data_handler.read_cached())
+    # Keep the strategies' order logs out of the summary table
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = runner.run_backtest()
+    return runner.get_metrics(results)
+
+
+def plan_jobs(
+    symbols, intervals, strategies, downloader=None, base_interval=None, compact=False
+):
+    """Fill the cache for every series and return the jobs, longest first.
+
+    Jobs are (bars, symbol, interval, strategy_name) tuples. A series that
+    cannot be fetched runs on what is cached, one without any bars in the
+    range is reported and left out. Intervals coarser than base_interval
+    are resampled from its bars. A compact cache stores float32 prices.
+    """
+    from main import DataHandler
+
+    jobs = []
+    for symbol in symbols:
+        for interval in intervals:
+            handler = DataHandler(
+                symbol=symbol,
+                interval=interval,
+                downloader=downloader,
+                base_interval=base_interval,
+                compact=compact,
+            )
+            try:
+                handler.fetch_missing()
+            except Exception as e:
+                # One unreachable series must not stop the whole batch
+                print("Could not fetch %s %s: %s" % (symbol, interval, e))
+            bars = len(handler.read_cached()["datetime"])
+            if not bars:
+                print("No %s %s price data, skipping" % (symbol, interval))
+                continue
+            jobs.extend((bars, symbol, interval, name) for name in strategies)
+
+    # Longest series first, so no long run is left to finish on its own
+    jobs.sort(key=lambda job: job[0], reverse=True)
+    return jobs
+
+
+def print_header():
+    print(
+        ROW_FORMAT
+        % (
+            "symbol",
+            "int.",
+            "strategy",
+            "bars",
+            "value",
+            "return",
+            "drawdown",
+            "winrate",
+            "sharpe",
+        )
+    )
+
+
+def print_row(job, metrics):
+    bars, symbol, interval, strategy_name = job
+    sharpe = metrics["sharpe"]
+    print(
+        ROW_FORMAT
+        % (
+            symbol,
+            interval,
+            strategy_name,
+            bars,
+            "%.2f" % metrics["final_value"],
+            "%.2f%%" % (metrics["total_return"] * 100),
+            "%.2f%%" % metrics["max_drawdown"],
+            "%.2f%%" % (metrics["winrate"] * 100),
+            "-" if sharpe is None else "%.3f" % sharpe,
+        )
+    )
+
+
+def run_batch(args):
+    """Run every symbol x interval x strategy combination in a process pool"""
+    from downloader import KlineDownloader
+    from main import STRATEGIES, parse_params
+
+    if args.strategies:
+        strategies = args.strategies
+    elif args.strategy_name == "all":
+        strategies = list(STRATEGIES)
+    else:
+        strategies = [args.strategy_name]
+    params = parse_params(args.params)
+
+    # One downloader, so every series shares the request weight budget
+    jobs = plan_jobs(
+        args.symbols,
+        args.intervals,
+        strategies,
+        KlineDownloader(),
+        args.base_interval,
+        args.compact,
+    )
+
+    # Workers never plot or profile, only the metrics are sent back
+    args.plot = args.save_plot = args.profile = False
+
+    workers = args.workers or os.cpu_count()
+    print("\nRunning %d backtests on %d workers..." % (len(jobs), workers))
+    print_header()
+
+    rows, failures = [], 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for job in jobs:
+            _, symbol, interval, name = job
+            futures[pool.submit(_run_job, args, symbol, interval, name, params)] = job
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                metrics = future.result()
+            except Exception as e:
+                failures += 1
+                print("%-12s %-5s %-18s failed: %s" % (job[1], job[2], job[3], e))
+                continue
+            rows.append((job, metrics))
+            print_row(job, metrics)
+
+    print(
+        "\nFinished %d backtests in %.1fs, %d failed"
+        % (len(rows), time.perf_counter() - started, failures)
+    )
+    return rows
@@ -0,0 +1,292 @@
+"""Backtest throughput benchmark on seeded synthetic data.
+
+Every (strategy, bar count, interval) case runs in a fresh process, so the
+peak RSS of one case is not inflated by the ones before it. Each case
+reports bars per second of the Cerebro run, wall time, peak RSS and how
+the time splits between loading the data, the run itself and the
+analyzers, and names the analyzers attached. Results are written as JSON,
+and ``--compare`` checks them against an earlier file to catch regressions:
+
+    python benchmark.py --bars 10000 100000 --output before.json
+    python benchmark.py --bars 10000 100000 --compare before.json
+"""
+
+import argparse
+import contextlib
+import datetime as dt
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import backtrader as bt
+import numpy as np
+
+from price_cache import PriceCache
+from profiling import ANALYZER_HOOKS
+from synthetic import synthetic_bars
+
+
+class PhaseTimer:
+    """Accumulates wall time per named phase"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def wrap(self, name, function):
+        """Return function with its calls counted towards phase name"""
+
+        def timed(*args, **kwargs):
+            with self.phase(name):
+                return function(*args, **kwargs)
+
+        return timed
+
+
+def timed_analyzer(cls, timer):
+    """Subclass of analyzer cls whose hooks count towards "analyzers".
+
+    Child analyzers an analyzer creates are driven from these hooks and
+    are included in the time.
+    """
+    namespace = {
+        hook: timer.wrap("analyzers", getattr(cls, hook)) for hook in ANALYZER_HOOKS
+    }
+    return type(cls.__name__, (cls,), namespace)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024.0**2 if sys.platform == "darwin" else 1024.0)
+
+
+def run_case(cache_dir, symbol, interval, strategy_name):
+    """Run one strategy over cached bars, meant to run in its own process"""
+    from main import BacktestRunner
+
+    timer = PhaseTimer()
+    with timer.phase("read"):
+        arrays = PriceCache(cache_dir).read(symbol, interval)
+
+    args = argparse.Namespace(
+        plot=False,
+        save_plot=False,
+        profile=False,
+        low_memory=False,
+        timeframes=[],
+        compact=False,
+    )
+    runner = BacktestRunner(args, strategy_name)
+    runner.setup_cerebro(arrays)
+    cerebro = runner.cerebro
+    data = cerebro.datas[0]
+    data.preload = timer.wrap("preload", data.preload)
+    analyzers = [ancls.__name__ for ancls, _, _ in cerebro.analyzers]
+    cerebro.analyzers = [
+        (timed_analyzer(ancls, timer), anargs, ankwargs)
+        for ancls, anargs, ankwargs in cerebro.analyzers
+    ]
+
+    # Strategies log their orders, keep that out of the benchmark output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with timer.phase("cerebro"):
+            results = runner.run_backtest()
+    metrics = runner.get_metrics(results)
+
+    seconds = timer.seconds
+    bars = len(arrays["datetime"])
+    run = seconds["cerebro"] - seconds["preload"] - seconds["analyzers"]
+    return {
+        "strategy": strategy_name,
+        "bars": bars,
+        "interval": interval,
+        "wall_s": seconds["read"] + seconds["cerebro"],
+        "load_s": seconds["read"] + seconds["preload"],
+        "run_s": run,
+        "analyzers_s": seconds["analyzers"],
+        "analyzers": analyzers,
+        "bars_per_s": bars / seconds["cerebro"],
+        "peak_rss_mb": peak_rss_mb(),
+        "final_value": metrics["final_value"],
+    }
+
+
+def environment():
+    """Versions the results depend on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "backtrader": bt.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "created": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def run_benchmark(strategies, bar_counts, intervals, seed=0):
+    """Run every case in a fresh process and return the result dicts"""
+    spawn = multiprocessing.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = PriceCache(cache_dir)
+        for interval in intervals:
+            for bars in bar_counts:
+                symbol = "SYNTH%d" % bars
+                cache.write(symbol, interval, synthetic_bars(bars, interval, seed))
+
+                for strategy_name in strategies:
+                    with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                        future = pool.submit(
+                            run_case, cache_dir, symbol, interval, strategy_name
+                        )
+                        result = dict(future.result(), seed=seed)
+                    results.append(result)
+                    print_case(result)
+    return results
+
+
+def print_case(result):
+    print(
+        "%-18s %9d %-4s %10.0f bars/s  wall %7.2fs  load %6.2fs  run %7.2fs  "
+        "analyzers %6.2fs  peak %7.1f MiB"
+        % (
+            result["strategy"],
+            result["bars"],
+            result["interval"],
+            result["bars_per_s"],
+            result["wall_s"],
+            result["load_s"],
+            result["run_s"],
+            result["analyzers_s"],
+            result["peak_rss_mb"],
+        )
+    )
+
+
+def compare(results, baseline, tolerance):
+    """Print throughput against a baseline, return the regressed cases.
+
+    Cases run with other analyzers than their baseline, e.g. ones recorded
+    before the analyzers were named, are shown but never flagged.
+    """
+
+    def key(case):
+        return case["strategy"], case["bars"], case["interval"]
+
+    before = {key(case): case for case in baseline["cases"]}
+
+    print(
+        "\n--- Compared to %s ---" % (baseline["environment"]["commit"] or "baseline")
+    )
+    regressions = []
+    for case in results:
+        old = before.get(key(case))
+        if old is None:
+            continue
+        change = case["bars_per_s"] / old["bars_per_s"] - 1.0
+        alike = case["analyzers"] == old.get("analyzers")
+        regressed = alike and change < -tolerance
+        if regressed:
+            regressions.append(case)
+        print(
+            "%-18s %9d %-4s %+7.1f%% bars/s  %+7.1f%% peak RSS%s%s"
+            % (
+                case["strategy"],
+                case["bars"],
+                case["interval"],
+                change * 100,
+                (case["peak_rss_mb"] / old["peak_rss_mb"] - 1.0) * 100,
+                "" if alike else "  (other analyzers)",
+                "  REGRESSION" if regressed else "",
+            )
+        )
+    return regressions
+
+
+def main():
+    from main import STRATEGIES
+
+    parser = argparse.ArgumentParser(description="Backtest throughput benchmark.")
+    parser.add_argument(
+        "--bars",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000],
+        help="Synthetic bar counts to run (default: 10000 100000).",
+    )
+    parser.add_argument(
+        "--intervals",
+        nargs="+",
+        default=["1h"],
+        help="Bar intervals of the synthetic data (default: 1h).",
+    )
+    parser.add_argument(
+        "--strategies",
+        nargs="+",
+        default=list(STRATEGIES),
+        choices=list(STRATEGIES),
+        help="Strategies to run (default: all).",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Data generator seed.")
+    parser.add_argument(
+        "--output",
+        default="benchmark.json",
+        help="JSON file for the results (default: benchmark.json).",
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        help="Earlier results to compare against, exits with 1 on a regression.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed drop in bars/s before --compare flags a case (default: 0.1).",
+    )
+    args = parser.parse_args()
+
+    report = {
+        "environment": environment(),
+        "cases": run_benchmark(args.strategies, args.bars, args.intervals, args.seed),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Results written to %s" % args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report["cases"], baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""Vectorized simulator for bracket order strategies.
+
+``CrossoverStochRSI`` and ``TripleSupertrend`` enter with ``buy_bracket`` or
+``sell_bracket``: a limit entry at the signal close plus a stop-loss and a
+take-profit leg. Instead of checking three live orders on every bar, each
+bracket is resolved with a few searches over the price arrays: the first
+bar after the signal that reaches the entry price, then the first bar
+after the fill that reaches either exit level.
+
+The brackets are then replayed in the order backtrader's broker would see
+them, with its submission and margin checks, so trade prices and pnl match
+a Cerebro run with ``PercentSizer(percents=100)`` and no commission.
+"""
+
+import heapq
+
+import numpy as np
+
+from fastind import IndicatorCache, crossover, first_valid
+from prescreen import PrescreenResult
+
+LONG, SHORT = 1, -1
+
+# Bracket legs, in the order the broker processes them within a bar
+ENTRY, STOP, TARGET = 0, 1, 2
+
+BRACKET_TRADE_DTYPE = np.dtype(
+    [
+        ("signal_bar", np.int64),
+        ("side", np.int8),
+        ("entry_bar", np.int64),
+        ("exit_bar", np.int64),
+        ("exit_leg", np.int8),
+        ("entry_price", np.float64),
+        ("exit_price", np.float64),
+        ("size", np.float64),
+        ("pnl", np.float64),
+    ]
+)
+
+
+def _first_hit(hit, begin, end, chunk=64):
+    """First bar in [begin, end) where hit(lo, hi) is True, -1 if none.
+
+    hit evaluates a window of bars at once. Windows start small, as most
+    levels are reached within a few bars, and double in size after a miss.
+    """
+    while begin < end:
+        stop = min(begin + chunk, end)
+        found = np.flatnonzero(hit(begin, stop))
+        if len(found):
+            return begin + int(found[0])
+        begin = stop
+        chunk *= 2
+    return -1
+
+
+class _Bars:
+    def __init__(self, open_, high, low):
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.n = len(open_)
+
+    def buy_limit(self, price, begin):
+        """Bar and price at which a buy limit order at price fills"""
+        bar = _first_hit(
+            lambda lo, hi: (self.open[lo:hi] <= price) | (self.low[lo:hi] <= price),
+            begin,
+            self.n,
+        )
+        return bar, min(self.open[bar], price) if bar >= 0 else np.nan
+
+    def sell_limit(self, price, begin):
+        bar = _first_hit(
+            lambda lo, hi: (self.open[lo:hi] >= price) | (self.high[lo:hi] >= price),
+            begin,
+            self.n,
+        )
+        return bar, max(self.open[bar], price) if bar >= 0 else np.nan
+
+    # Stops trigger on the same conditions, a gap fills at the open as well
+    buy_stop = sell_limit
+    sell_stop = buy_limit
+
+    def exit(self, side, stop_price, target_price, begin):
+        """(bar, leg, price) of the first exit leg to fill from begin.
+
+        The stop is processed before the target, so it wins when both
+        levels are crossed within one bar.
+        """
+        if side == LONG:
+            stop = self.sell_stop(stop_price, begin)
+            target = self.sell_limit(target_price, begin)
+        else:
+            stop = self.buy_stop(stop_price, begin)
+            target = self.buy_limit(target_price, begin)
+
+        if stop[0] >= 0 and (target[0] < 0 or stop[0] <= target[0]):
+            return stop[0], STOP, stop[1]
+        if target[0] >= 0:
+            return target[0], TARGET, target[1]
+        return -1, -1, np.nan
+
+
+class _Position:
+    """Cash and position arithmetic of bt.BackBroker with shortcash"""
+
+    def __init__(self, cash, size=0.0, price=0.0):
+        self.cash = cash
+        self.size = size
+        self.price = price
+
+    def clone(self):
+        return _Position(self.cash, self.size, self.price)
+
+    def update(self, size, price):
+        """bt.Position.update, returns (opened, closed)"""
+        oldsize = self.size
+        self.size += size
+        if not self.size:
+            opened, closed = 0.0, size
+            self.price = 0.0
+        elif not oldsize:
+            opened, closed = size, 0.0
+            self.price = price
+        elif (oldsize > 0) == (size > 0):
+            opened, closed = size, 0.0
+            self.price = (self.price * oldsize + size * price) / self.size
+        elif (oldsize > 0) == (self.size > 0):
+            opened, closed = 0.0, size
+        else:
+            opened, closed = self.size, -oldsize
+            self.price = price
+        return opened, closed
+
+    def pseudo_execute(self, size, price):
+        """Submission check of one order, False if the broker rejects it"""
+        opened, closed = self.update(size, price)
+        if closed:
+            self.cash += -closed * price
+        if opened:
+            self.cash -= opened * price
+        return self.cash >= 0.0
+
+    def execute(self, size, price):
+        """Fill an order, False if opening a position fails the margin check.
+
+        As in backtrader, the part of the order that closes an existing
+        position is executed even when the opening part is rejected.
+        """
+        pprice_orig = self.price
+        opened, closed = self.clone().update(size, price)
+
+        if closed:
+            pnl = -closed * (price - pprice_orig)
+            self.cash += -closed * pprice_orig + pnl
+        accepted = True
+        if opened:
+            cash = self.cash - opened * price
+            if cash < 0.0:
+                opened, accepted = 0.0, False
+            else:
+                self.cash = cash
+
+        if closed + opened:
+            self.update(closed + opened, price)
+        return accepted
+
+
+def simulate_brackets(
+    open_,
+    high,
+    low,
+    close,
+    long_entries,
+    short_entries,
+    take_profit,
+    stop_loss,
+    start,
+    cash=1000.0,
+    end=None,
+):
+    """Replay the bracket orders of boolean long/short entry signal arrays.
+
+    A flat strategy evaluates signals on bar close from ``start`` up to
+    ``end`` and sends
+    a bracket sized with all its cash: a limit entry at the close, a stop at
+    ``stop_loss`` and a limit at ``take_profit`` (fractions of the close)
+    on either side. Unfilled entries stay pending, like backtrader's GTC
+    orders, so several brackets can be live at once.
+    """
+    open_, high, low, close = (
+        np.asarray(column, dtype=np.float64)[:end]
+        for column in (open_, high, low, close)
+    )
+    n = len(close)
+    bars = _Bars(open_, high, low)
+    signals = np.flatnonzero(
+        (np.asarray(long_entries) | np.asarray(short_entries))[: n - 1]
+    )
+    signals = signals[signals >= start]
+    closes = close.tolist()
+
+    broker = _Position(cash)
+    brackets = []
+    events = []  # (bar, bracket, leg, price), ordered like the pending queue
+    trades = []
+    changes = [(0, cash, 0.0)]
+
+    def process(until):
+        while events and events[0][0] <= until:
+            bar, index, leg, price = heapq.heappop(events)
+            bracket = brackets[index]
+            side, size = bracket["side"], bracket["size"]
+            if leg == ENTRY:
+                if not broker.execute(side * size, price):
+                    changes.append((bar, broker.cash, broker.size))
+                    continue  # margin, the exit legs are cancelled
+                bracket["entry"] = (bar, price)
+                exit_bar, exit_leg, exit_price = bars.exit(
+                    side, bracket["stop"], bracket["target"], bar + 1
+                )
+                if exit_bar >= 0:
+                    heapq.heappush(events, (exit_bar, index, exit_leg, exit_price))
+                else:
+                    trades.append(_trade(bracket, -1, -1, np.nan))
+            else:
+                broker.execute(-side * size, price)
+                trades.append(_trade(bracket, bar, leg, price))
+            changes.append((bar, broker.cash, broker.size))
+
+    for signal in signals.tolist():
+        process(signal)
+        if broker.size:
+            continue
+
+        side = LONG if long_entries[signal] else SHORT
+        price1 = closes[signal]
+        price2 = price1 - stop_loss * price1
+        price3 = price1 + take_profit * price1
+        stop, target = (price2, price3) if side == LONG else (price3, price2)
+        size = broker.cash / price1
+
+        # Submission check of the three legs at the created prices
+        check = broker.clone()
+        if not all(
+            check.pseudo_execute(leg_side * size, price)
+            for leg_side, price in ((side, price1), (-side, stop), (-side, target))
+        ):
+            continue
+
+        entry = bars.buy_limit if side == LONG else bars.sell_limit
+        fill_bar, fill_price = entry(price1, signal + 1)
+        if fill_bar < 0:
+            continue
+        brackets.append(
+            dict(signal=signal, side=side, size=size, stop=stop, target=target)
+        )
+        heapq.heappush(events, (fill_bar, len(brackets) - 1, ENTRY, fill_price))
+
+    process(n)
+
+    change_bars, change_cash, change_size = map(np.asarray, zip(*changes))
+    segment = np.searchsorted(change_bars, np.arange(n), "right") - 1
+    equity = change_cash[segment] + change_size[segment] * close
+    trades = np.array(sorted(trades), dtype=BRACKET_TRADE_DTYPE)
+    return PrescreenResult(equity, trades, cash)
+
+
+def _trade(bracket, exit_bar, exit_leg, exit_price):
+    entry_bar, entry_price = bracket["entry"]
+    side, size = bracket["side"], bracket["size"]
+    pnl = side * size * (exit_price - entry_price)
+    return (
+        bracket["signal"],
+        side,
+        entry_bar,
+        exit_bar,
+        exit_leg,
+        entry_price,
+        exit_price,
+        side * size,
+        pnl,
+    )
+
+
+def _stoch_signals(cache, k_period=3, d_period=3, rsi_period=14, stoch_period=14):
+    fastk, fastd = cache.get(
+        "stoch_rsi", "close", k_period, d_period, rsi_period, stoch_period
+    )
+    return fastk, crossover(fastk, fastd)
+
+
+def run_crossover_stochrsi(
+    arrays,
+    rsi_period=14,
+    stoch_k_period=3,
+    stoch_d_period=3,
+    stoch_rsi_period=14,
+    stoch_period=14,
+    stoch_upperband=80.0,
+    stoch_lowerband=20.0,
+    take_profit=0.08,
+    stop_loss=0.04,
+    size=20,
+    debug=False,
+    cash=1000.0,
+    cache=None,
+    begin=0,
+    end=None,
+):
+    """Vectorized CrossoverStochRSI, takes the strategy's params.
+
+    Only the bars in [begin, end) are traded.
+    """
+    cache = cache or IndicatorCache(arrays)
+    fastk, cross = _stoch_signals(
+        cache, stoch_k_period, stoch_d_period, stoch_rsi_period, stoch_period
+    )
+    with np.errstate(invalid="ignore"):
+        longs = (fastk < 20) & (cross > 0)
+        shorts = (fastk > 80) & (cross < 0)
+    return simulate_brackets(
+        arrays["open"],
+        arrays["high"],
+        arrays["low"],
+        arrays["close"],
+        longs,
+        shorts,
+        take_profit,
+        stop_loss,
+        start=max(first_valid(fastk), first_valid(cross), begin),
+        cash=cash,
+        end=end,
+    )
+
+
+def run_triple_supertrend(
+    arrays,
+    EMA_length=200,
+    ATR_fast_length=10,
+    ATR_mid_length=11,
+    ATR_slow_length=12,
+    take_profit=0.08,
+    stop_loss=0.04,
+    cash=1000.0,
+    cache=None,
+    begin=0,
+    end=None,
+):
+    """Vectorized TripleSupertrend, takes the strategy's params.
+
+    Only the bars in [begin, end) are traded.
+    """
+    cache = cache or IndicatorCache(arrays)
+    close = np.asarray(arrays["close"], dtype=np.float64)
+    fastk, cross = _stoch_signals(cache)
+    ema = cache.get("ema", "close", EMA_length)
+    trends = [
+        cache.get("supertrend", ("high", "low", "close"), period, multiplier)
+        for period, multiplier in (
+            (ATR_fast_length, 1),
+            (ATR_mid_length, 2),
+            (ATR_slow_length, 3),
+        )
+    ]
+    slow = trends[-1]
+
+    with np.errstate(invalid="ignore"):
+        longs = (fastk < 20) & (cross > 0) & (ema < close) & (close < slow)
+        shorts = (fastk > 80) & (cross < 0) & (ema > close) & (close > slow)
+    # The fast and mid supertrends are unused but still delay the first next()
+    start = max(first_valid(line) for line in [fastk, cross, ema] + trends)
+    return simulate_brackets(
+        arrays["open"],
+        arrays["high"],
+        arrays["low"],
+        close,
+        longs,
+        shorts,
+        take_profit,
+        stop_loss,
+        start=max(start, begin),
+        cash=cash,
+        end=end,
+    )
+
+
+ENGINES = {
+    "CrossoverStochRSI": run_crossover_stochrsi,
+    "TripleSupertrend": run_triple_supertrend,
+}
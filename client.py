@@ -0,0 +1,82 @@
+"""Thin command line client of the backtest service in server.py.
+
+Imports nothing but the standard library, so a run costs the job itself
+plus a Python start-up:
+
+    python client.py --strategy MaCross --param fast_length=20
+"""
+
+import argparse
+import json
+import sys
+import urllib.error
+import urllib.request
+
+
+def submit(url, job):
+    """POST a job to the service at url and return its answer"""
+    request = urllib.request.Request(
+        url.rstrip("/") + "/backtest",
+        data=json.dumps(job).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(json.load(e).get("error", str(e))) from None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Submit a backtest to the service.")
+    parser.add_argument(
+        "--server",
+        default="http://127.0.0.1:8765",
+        help="URL of the service (default: http://127.0.0.1:8765).",
+    )
+    parser.add_argument("--strategy", default="MaCross", help="Strategy to run.")
+    parser.add_argument(
+        "--param",
+        dest="params",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Strategy parameter, repeat for several parameters.",
+    )
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--interval", default="1h")
+    parser.add_argument("--start", default=None, help="First day, e.g. 2020-01-01.")
+    parser.add_argument("--end", default=None, help="Last day, e.g. 2021-01-01.")
+    parser.add_argument("--timeframes", nargs="+", default=[], metavar="INTERVAL")
+    parser.add_argument(
+        "--rerun",
+        action="store_true",
+        help="Run even if the result store holds an identical run.",
+    )
+    args = parser.parse_args()
+
+    job = {
+        name: getattr(args, name)
+        for name in (
+            "strategy",
+            "params",
+            "symbol",
+            "interval",
+            "start",
+            "end",
+            "timeframes",
+            "rerun",
+        )
+    }
+    try:
+        answer = submit(args.server, job)
+    except (OSError, RuntimeError) as e:
+        sys.exit("Backtest failed: %s" % e)
+    if answer["stored"]:
+        print("Stored result of an identical run %s" % answer["key"][:12])
+    print(answer["report"], end="")
+    print("\n%d bars in %.0f ms" % (answer["bars"], answer["seconds"] * 1000))
+
+
+if __name__ == "__main__":
+    main()
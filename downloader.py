@@ -0,0 +1,155 @@
+"""Concurrent Binance kline downloader with a request weight budget"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from price_cache import COLUMNS, interval_millis
+
+BINANCE_URL = "https://api.binance.com"
+
+
+def parse_klines(rows):
+    """Convert raw kline rows into the contiguous column arrays of the cache.
+
+    The open times become an int64 array of epoch ms, the price and volume
+    strings are parsed in one pass into a (5, n) float64 block whose rows
+    are handed out as the column arrays.
+    """
+    n = len(rows)
+    times = np.fromiter((row[0] for row in rows), dtype=np.int64, count=n)
+    values = np.array([row[1:6] for row in rows], dtype=np.float64).reshape(n, 5)
+    values = np.ascontiguousarray(values.T)
+    return dict(zip(COLUMNS, [times, *values]))
+
+
+class RateLimiter:
+    """Thread-safe sliding window budget of request weight per minute"""
+
+    def __init__(self, weight_per_minute=1200, window=60.0):
+        self.weight_per_minute = weight_per_minute
+        self.window = window
+        self._spent = deque()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, weight):
+        """Block until weight fits into the budget, then spend it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._spent and self._spent[0][0] <= now - self.window:
+                    self._spent.popleft()
+                used = sum(w for _, w in self._spent)
+                wait = self._paused_until - now
+                if wait <= 0 and used + weight <= self.weight_per_minute:
+                    self._spent.append((now, weight))
+                    return
+                if wait <= 0:
+                    wait = self._spent[0][0] + self.window - now
+            time.sleep(max(wait, 0.01))
+
+    def pause(self, seconds):
+        """Hold every caller back for seconds, e.g. after a 429"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def sync(self, used_weight):
+        """Pause for the rest of the window if the server reports the budget spent"""
+        if used_weight >= self.weight_per_minute:
+            self.pause(self.window - time.time() % self.window)
+
+
+class KlineDownloader:
+    """Downloads klines as fixed page windows over a pooled HTTP session.
+
+    The requested range is split into windows of ``limit`` bars up front,
+    the windows are fetched by a thread pool and the pages are returned in
+    time order. Every request spends ``request_weight`` from the rate
+    limiter. 429/418 answers pause all workers for the Retry-After delay,
+    other failures are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        base_url=BINANCE_URL,
+        workers=8,
+        weight_per_minute=1200,
+        request_weight=2,
+        limit=1000,
+        max_retries=5,
+        backoff=1.0,
+        timeout=30,
+    ):
+        self.url = base_url.rstrip("/") + "/api/v3/klines"
+        self.workers = workers
+        self.request_weight = request_weight
+        self.limit = limit
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(weight_per_minute)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def page_windows(self, interval, start, end):
+        """Split [start, end] (epoch ms) into windows of at most limit bars"""
+        span = self.limit * interval_millis(interval)
+        return [(s, min(s + span - 1, end)) for s in range(start, end + 1, span)]
+
+    def fetch_page(self, symbol, interval, start, end):
+        """Fetch the raw kline rows of one window"""
+        params = {
+            "symbol": symbol,
+            "interval": interval,
+            "startTime": str(start),
+            "endTime": str(end),
+            "limit": str(self.limit),
+        }
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(self.request_weight)
+            try:
+                response = self.session.get(
+                    self.url, params=params, timeout=self.timeout
+                )
+            except requests.RequestException:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff * 2**attempt)
+                continue
+
+            used = response.headers.get("X-MBX-USED-WEIGHT-1M")
+            if used is not None:
+                self.limiter.sync(int(used))
+
+            if response.status_code in (418, 429):
+                retry_after = response.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after else self.backoff * 2**attempt
+                self.limiter.pause(delay)
+            elif response.status_code >= 500:
+                time.sleep(self.backoff * 2**attempt)
+            else:
+                response.raise_for_status()
+                return response.json()
+
+        raise RuntimeError(
+            "Giving up on %s %s klines %d-%d after %d retries"
+            % (symbol, interval, start, end, self.max_retries)
+        )
+
+    def fetch(self, symbol, interval, start, end):
+        """Fetch every kline row between start and end (epoch ms), in order"""
+        windows = self.page_windows(interval, start, end)
+        if not windows:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(windows))) as pool:
+            pages = pool.map(lambda w: self.fetch_page(symbol, interval, *w), windows)
+            return [row for page in pages for row in page]
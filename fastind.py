@@ -0,0 +1,238 @@
+"""NumPy versions of the backtrader indicators used by the strategies.
+
+Every function takes whole float64 arrays and returns an array of the same
+length, NaN until the bar at which backtrader would deliver the first value,
+so that indexes line up with the bars of the data feed. Recursive indicators
+run as tight loops over Python floats, performing the same operations in
+the same order as backtrader, which keeps them bit for bit identical.
+"""
+
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def first_valid(values):
+    """Index of the first non-NaN value, len(values) if there is none"""
+    valid = np.flatnonzero(~np.isnan(values))
+    return int(valid[0]) if len(valid) else len(values)
+
+
+# Longest window still summed with math.fsum, as backtrader does
+EXACT_SUM_PERIOD = 16
+
+
+def sma(values, period):
+    """bt.ind.SMA
+
+    Windows of up to EXACT_SUM_PERIOD bars are summed exactly like
+    backtrader, longer ones with NumPy, which may differ in the last bit.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) < period:
+        return out
+    if period <= EXACT_SUM_PERIOD:
+        items = values.tolist()
+        out[period - 1 :] = [
+            math.fsum(items[i - period + 1 : i + 1]) / period
+            for i in range(period - 1, len(items))
+        ]
+    else:
+        out[period - 1 :] = sliding_window_view(values, period).sum(axis=1) / period
+    return out
+
+
+def ema(values, period, alpha=None):
+    """bt.ind.EMA, seeded with the SMA of the first period values"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    start = first_valid(values) + period - 1
+    if start >= len(values):
+        return out
+
+    alpha = 2.0 / (1.0 + period) if alpha is None else alpha
+    alpha1 = 1.0 - alpha
+    seed = math.fsum(values[start - period + 1 : start + 1].tolist()) / period
+
+    result = [seed]
+    prev = seed
+    for value in values[start + 1 :].tolist():
+        prev = prev * alpha1 + value * alpha
+        result.append(prev)
+    out[start:] = result
+    return out
+
+
+def smma(values, period):
+    """bt.ind.SmoothedMovingAverage (Wilder)"""
+    return ema(values, period, alpha=1.0 / period)
+
+
+def wma(values, period):
+    """bt.ind.WMA, weights 1..period with the newest bar weighted most"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    start = first_valid(values)
+    if len(values) - start >= period:
+        coef = 2.0 / (period * (period + 1.0))
+        weights = np.arange(1, period + 1, dtype=np.float64)
+        windows = sliding_window_view(values[start:], period)
+        out[start + period - 1 :] = coef * (windows @ weights)
+    return out
+
+
+def hma(values, period):
+    """bt.ind.HMA"""
+    diff = 2.0 * wma(values, period // 2) - wma(values, period)
+    return wma(diff, int(pow(period, 0.5)))
+
+
+def crossover(a, b):
+    """bt.ind.CrossOver: 1.0 on an upward cross of a over b, -1.0 downward"""
+    diff = np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64)
+    out = np.full(len(diff), np.nan)
+    start = first_valid(diff)
+    if start + 1 >= len(diff):
+        return out
+
+    # NonZeroDifference: the last difference that was not zero
+    keep = diff != 0.0
+    keep[start] = True
+    keep[:start] = False
+    index = np.maximum.accumulate(np.where(keep, np.arange(len(diff)), 0))
+    nzd = diff[index]
+
+    before, now = nzd[start:-1], diff[start + 1 :]
+    up = (before < 0.0) & (now > 0.0)
+    down = (before > 0.0) & (now < 0.0)
+    out[start + 1 :] = up.astype(np.float64) - down.astype(np.float64)
+    return out
+
+
+def highest(values, period):
+    """bt.ind.Highest"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    start = first_valid(values)
+    if len(values) - start >= period:
+        windows = sliding_window_view(values[start:], period)
+        out[start + period - 1 :] = windows.max(axis=1)
+    return out
+
+
+def lowest(values, period):
+    """bt.ind.Lowest"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    start = first_valid(values)
+    if len(values) - start >= period:
+        windows = sliding_window_view(values[start:], period)
+        out[start + period - 1 :] = windows.min(axis=1)
+    return out
+
+
+def rsi(values, period=14):
+    """bt.ind.RSI, Wilder smoothing of UpDay and DownDay"""
+    values = np.asarray(values, dtype=np.float64)
+    up = np.full(len(values), np.nan)
+    down = np.full(len(values), np.nan)
+    up[1:] = np.maximum(values[1:] - values[:-1], 0.0)
+    down[1:] = np.maximum(values[:-1] - values[1:], 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = smma(up, period) / smma(down, period)
+        return 100.0 - 100.0 / (1.0 + rs)
+
+
+def stoch_rsi(values, k_period=3, d_period=3, rsi_period=14, stoch_period=14):
+    """(fastk, fastd) of strategies.StochasticRSI"""
+    line = rsi(values, rsi_period)
+    rsi_hh = highest(line, stoch_period)
+    rsi_ll = lowest(line, stoch_period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = sma(100.0 * ((line - rsi_ll) / (rsi_hh - rsi_ll)), k_period)
+    return k, sma(k, d_period)
+
+
+def true_range(high, low, close):
+    """bt.ind.TrueRange"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    out[1:] = np.maximum(high[1:], close[:-1]) - np.minimum(low[1:], close[:-1])
+    return out
+
+
+def supertrend(high, low, close, period=7, multiplier=3):
+    """strategies.SuperTrend, the band and trend recursions as Python loops"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    out = np.full(n, np.nan)
+    if n <= period:
+        return out
+
+    atr = smma(true_range(high, low, close), period)
+    hl2 = (high + low) / 2
+    basic_ub = (hl2 + (atr * multiplier)).tolist()
+    basic_lb = (hl2 - (atr * multiplier)).tolist()
+    closes = close.tolist()
+
+    final_ub = basic_ub[:]
+    final_lb = basic_lb[:]
+    trend = [math.nan] * n
+    trend[period] = final_ub[period]
+    for i in range(period + 1, n):
+        if basic_ub[i] < final_ub[i - 1] or closes[i - 1] > final_ub[i - 1]:
+            final_ub[i] = basic_ub[i]
+        else:
+            final_ub[i] = final_ub[i - 1]
+
+        if basic_lb[i] > final_lb[i - 1] or closes[i - 1] < final_lb[i - 1]:
+            final_lb[i] = basic_lb[i]
+        else:
+            final_lb[i] = final_lb[i - 1]
+
+        if trend[i - 1] == final_ub[i - 1]:
+            trend[i] = final_ub[i] if closes[i] <= final_ub[i] else final_lb[i]
+        if trend[i - 1] == final_lb[i - 1]:
+            trend[i] = final_lb[i] if closes[i] >= final_lb[i] else final_ub[i]
+
+    out[period:] = trend[period:]
+    return out
+
+
+class IndicatorCache:
+    """Memoizes indicator arrays computed over one price series.
+
+    ``get("sma", "close", 50)`` computes ``sma(close, 50)`` once and returns
+    the stored array on later calls, so parameter grids only pay for the
+    indicator values they have not seen yet. Indicators of several columns
+    take a tuple, e.g. ``get("supertrend", ("high", "low", "close"), 10, 1)``.
+    """
+
+    FUNCTIONS = {
+        "sma": sma,
+        "ema": ema,
+        "smma": smma,
+        "wma": wma,
+        "hma": hma,
+        "rsi": rsi,
+        "stoch_rsi": stoch_rsi,
+        "supertrend": supertrend,
+    }
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self._cache = {}
+
+    def get(self, name, column, *args):
+        key = (name, column) + args
+        if key not in self._cache:
+            columns = column if isinstance(column, tuple) else (column,)
+            values = [np.asarray(self.arrays[c], dtype=np.float64) for c in columns]
+            self._cache[key] = self.FUNCTIONS[name](*values, *args)
+        return self._cache[key]
@@ -0,0 +1,170 @@
+"""Decimated chart of a finished run, drawn in seconds at any history length.
+
+``cerebro.plot`` draws a candle and a point of every line for every bar,
+which takes minutes and gigabytes on years of hourly bars. ``plot_run``
+draws the same panels, the price with the indicators plotted on it, one
+panel per other indicator and the broker value, from at most four points
+per pixel column of every line: the first, lowest, highest and last value
+of the bars falling into the column (M4 decimation). A line drawn through
+them covers the same pixels as one drawn through every bar, so spikes,
+crossings and extremes stay visible. Buys and sells are marked at their
+exact bars from the compact lists of the ``BuySell`` observer.
+"""
+
+import backtrader as bt
+import numpy as np
+
+from recorder import datenum_to_millis
+
+FIGSIZE = (20, 10)
+DPI = 150
+
+
+def m4_indices(values, columns):
+    """Indices of the first, min, max and last value of every column.
+
+    The values are split into columns of equal bar counts. NaN values,
+    e.g. the warm-up of an indicator, are skipped unless a column has
+    nothing else. Returns sorted unique indices.
+    """
+    n = len(values)
+    if n <= 4 * columns:
+        return np.arange(n)
+    size = -(-n // columns)
+    padded = np.full(size * -(-n // size), np.nan)
+    padded[:n] = values
+    rows = padded.reshape(-1, size)
+    nan = np.isnan(rows)
+    starts = np.arange(0, len(padded), size)
+    picks = np.stack(
+        [
+            starts,
+            starts + np.where(nan, np.inf, rows).argmin(axis=1),
+            starts + np.where(nan, -np.inf, rows).argmax(axis=1),
+            np.minimum(starts + size - 1, n - 1),
+        ]
+    )
+    return np.unique(np.minimum(picks, n - 1))
+
+
+def _line_values(line, bars):
+    """Values of a finished line, None when not clocked by the main data"""
+    # Observer buffers are allocated ahead, only len(line) values are set
+    values = np.frombuffer(line.array, dtype=np.float64)[: len(line)]
+    return values if len(values) == bars else None
+
+
+def _plot_indicator(ax, indicator, times, bars, columns):
+    """Draw the lines of indicator on ax, decimated to columns"""
+    for i in range(indicator.size()):
+        name = indicator.lines._getlinealias(i)
+        info = getattr(indicator.plotlines, name, None) or bt.AutoInfoClass()
+        if info._get("_plotskip", False):
+            continue
+        values = _line_values(indicator.lines[i], bars)
+        if values is None:
+            continue
+        keep = m4_indices(values, columns)
+        ax.plot(
+            times[keep],
+            values[keep],
+            lw=0.8,
+            label="%s %s" % (indicator.plotlabel(), name),
+        )
+    for level in indicator.plotinfo.plotyhlines or indicator.plotinfo.plothlines:
+        ax.axhline(level, color="grey", lw=0.5, ls="--")
+
+
+def plot_run(strategy, path=None, figsize=FIGSIZE, dpi=DPI):
+    """Plot a finished run of strategy on a preloaded feed.
+
+    Saves the figure to path, or shows it when path is None. Returns the
+    figure.
+    """
+    import matplotlib
+
+    if path is not None:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    data = strategy.datas[0]
+    bars = len(data)
+    times = datenum_to_millis(_line_values(data.lines.datetime, bars)).astype(
+        "datetime64[ms]"
+    )
+    # One column per pixel of the plotted width
+    columns = int(figsize[0] * dpi)
+
+    overlays, panels = [], []
+    for indicator in strategy.getindicators():
+        if not indicator.plotinfo.plot:
+            continue
+        if indicator.plotinfo.subplot:
+            panels.append(indicator)
+        else:
+            overlays.append(indicator)
+
+    figure, axes = plt.subplots(
+        len(panels) + 2,
+        1,
+        sharex=True,
+        figsize=figsize,
+        gridspec_kw={"height_ratios": [4] + [1] * (len(panels) + 1)},
+        squeeze=False,
+    )
+    axes = axes[:, 0]
+
+    price = axes[0]
+    close = _line_values(data.lines.close, bars)
+    # The high/low band of every column stands in for its candles
+    size = max(-(-bars // columns), 1)
+    starts = np.arange(0, bars, size)
+    price.fill_between(
+        times[starts],
+        np.fmin.reduceat(_line_values(data.lines.low, bars), starts),
+        np.fmax.reduceat(_line_values(data.lines.high, bars), starts),
+        step="post",
+        color="lightgrey",
+        lw=0,
+    )
+    keep = m4_indices(close, columns)
+    price.plot(times[keep], close[keep], color="black", lw=0.8, label="close")
+    for indicator in overlays:
+        _plot_indicator(price, indicator, times, bars, columns)
+
+    for observer in strategy.getobservers():
+        if isinstance(observer, bt.observers.BuySell):
+            for name, marker, color in (("buy", "^", "green"), ("sell", "v", "red")):
+                values = _line_values(getattr(observer.lines, name), bars)
+                if values is None:
+                    continue
+                trades = np.flatnonzero(~np.isnan(values))
+                price.scatter(
+                    times[trades],
+                    values[trades],
+                    marker=marker,
+                    color=color,
+                    s=40,
+                    zorder=3,
+                    label="%s (%d)" % (name, len(trades)),
+                )
+    price.legend(loc="upper left", fontsize="small")
+
+    for ax, indicator in zip(axes[1:], panels):
+        _plot_indicator(ax, indicator, times, bars, columns)
+        ax.legend(loc="upper left", fontsize="small")
+
+    equity = strategy.analyzers.equity.get_analysis()
+    value = equity["value"]
+    keep = m4_indices(value, columns)
+    axes[-1].plot(
+        equity["datetime"][keep].astype("datetime64[ms]"), value[keep], lw=0.8
+    )
+    axes[-1].set_ylabel("value")
+
+    figure.tight_layout()
+    if path is None:
+        plt.show()
+    else:
+        figure.savefig(path, dpi=dpi)
+    return figure
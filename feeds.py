@@ -0,0 +1,122 @@
+"""Backtrader data feed backed by NumPy arrays"""
+
+import array
+import itertools
+
+import backtrader as bt
+import numpy as np
+
+# backtrader date number of 1970-01-01, see bt.date2num
+EPOCH_DATENUM = 719163.0
+MILLIS_PER_DAY = 86_400_000.0
+
+PRICE_LINES = ("open", "high", "low", "close", "volume")
+
+
+def millis_to_datenum(millis):
+    """Vectorized bt.date2num for naive UTC epoch millisecond timestamps"""
+    return np.asarray(millis, dtype=np.int64) / MILLIS_PER_DAY + EPOCH_DATENUM
+
+
+class ArrayData(bt.feed.DataBase):
+    """Feeds a dict of column arrays straight into backtrader lines.
+
+    ``dataname`` holds ``datetime`` (epoch ms) plus the ``open``, ``high``,
+    ``low``, ``close`` and ``volume`` arrays, as returned by
+    ``PriceCache.read``. When cerebro preloads, every line buffer is filled
+    with one memory copy per column. Without preloading (e.g. exactbars)
+    bars are handed out one at a time by ``_load``.
+    """
+
+    def start(self):
+        super().start()
+        self._set_arrays(self.p.dataname)
+
+    def _set_arrays(self, arrays):
+        self._datenum = millis_to_datenum(arrays["datetime"])
+        self._columns = [
+            (getattr(self.lines, name), np.asarray(arrays[name], dtype=np.float64))
+            for name in PRICE_LINES
+        ]
+        self._idx = -1
+
+    def _load(self):
+        self._idx += 1
+        if self._idx >= len(self._datenum):
+            return False
+
+        self.lines.datetime[0] = self._datenum.item(self._idx)
+        for line, values in self._columns:
+            line[0] = values.item(self._idx)
+        return True
+
+    def qbuffer(self, savemem=0, replaying=False):
+        # Every strategy of a cerebro calls this, and backtrader resets the
+        # buffers each time, dropping the lookback the indicators of the
+        # strategies before asked for. Keep the longest.
+        sizes = [line.maxlen if line.mode == line.QBuffer else 0 for line in self.lines]
+        super().qbuffer(savemem, replaying)
+        # Next to other feeds, a bar loaded ahead of its time is taken back
+        # again, which must leave the previous bar in the buffer
+        for line, size in zip(self.lines, sizes):
+            line.minbuffer(max(size, 2))
+
+    def preload(self):
+        if self._filters or self._ffilters or self._tzinput:
+            # Filters need the bar by bar path of the base class
+            return super().preload()
+
+        lo = np.searchsorted(self._datenum, self.fromdate, "left")
+        hi = np.searchsorted(self._datenum, self.todate, "right")
+        columns = [(self.lines.datetime, self._datenum)] + self._columns
+
+        for line, values in columns:
+            line.array = array.array("d", values[lo:hi].tobytes())
+        for line in self.lines:
+            if len(line.array) != hi - lo:  # e.g. openinterest
+                line.array = array.array("d", [float("nan")]) * (hi - lo)
+            line.idx = line.lencount = hi - lo
+        self._idx = len(self._datenum)
+        self.home()
+
+
+class ChunkedArrayData(ArrayData):
+    """Streams a history bar by bar from consecutive chunks of column arrays.
+
+    ``dataname`` is a callable returning an iterable of dicts laid out like
+    the ``ArrayData`` ones, e.g. ``PriceCache.iter_months`` bound to a
+    series. Only the chunk being read is referenced, so together with
+    ``exactbars`` the memory used does not grow with the history.
+    """
+
+    def start(self):
+        bt.feed.DataBase.start(self)
+        self._chunks = iter(self.p.dataname())
+        self._datenum = np.empty(0)
+        self._idx = -1
+
+    def _load(self):
+        while self._idx + 1 >= len(self._datenum):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return False
+            self._set_arrays(chunk)
+        return super()._load()
+
+    def preload(self):
+        # No random access into the chunks, load bar by bar
+        return bt.feed.DataBase.preload(self)
+
+    def feed(self, chunks):
+        """Continue with the chunks of an iterable once the current ones run out.
+
+        Lets a run whose chunks were exhausted, e.g. one restored from a
+        checkpoint, go on with newly arrived bars.
+        """
+        self._chunks = itertools.chain(self._chunks, chunks)
+
+    def __getstate__(self):
+        # Chunk iterators are often generators, which cannot be pickled
+        state = self.__dict__.copy()
+        state["_chunks"] = iter(())
+        return state
@@ -1,163 +1,325 @@
 # -*- coding: utf-8 -*-
 """BTCUSD - MovingAverage strategy"""
 
-import os
-import requests
 import backtrader as bt
 from strategies import MaCross, TripleSupertrend, CrossoverStochRSI, TripleEMaStrategy
-import backtrader.analyzers as btanalyzers
-import json
-import pandas as pd
 import datetime as dt
 import argparse
-import matplotlib.pyplot as plt
-import pickle
+from downloader import KlineDownloader, parse_klines
+from feeds import ArrayData, ChunkedArrayData
+from metrics import compute_metrics
+from recorder import EquityRecorder
+from result_store import (
+    ResultStore,
+    cerebro_settings,
+    data_fingerprint,
+    print_runs,
+    run_key,
+    strategy_params,
+)
+from price_cache import (
+    PriceCache,
+    COLUMNS as CACHE_COLUMNS,
+    from_millis,
+    interval_millis,
+    last_closed_bar,
+    to_millis,
+)
+from resample import ResampledCache, close_stamped, resample
 
 
 class DataHandler:
     def __init__(
         self,
-        data_file="btc_price_data.pkl",
+        cache_dir="price_cache",
         symbol="BTCUSDT",
         interval="1h",
         start_date=dt.datetime(2019, 1, 1),
         end_date=dt.datetime(2022, 5, 1),
+        downloader=None,
+        base_interval=None,
+        compact=False,
     ):
-        self.data_file = data_file
+        self.cache_dir = cache_dir
+        self.compact = compact
+        self.cache = PriceCache(cache_dir, compact)
+        self.downloader = downloader or KlineDownloader()
         self.symbol = symbol
         self.interval = interval
         self.start_date = start_date
         self.end_date = end_date
-
-    def load_or_fetch_data(self):
-        """Load cached data or fetch new data from Binance"""
-        if os.path.exists(self.data_file):
-            print("Loading cached price data...")
-            with open(self.data_file, "rb") as f:
-                return pickle.load(f)
-
-        print("Fetching new price data...")
-        df_list = []
-        last_datetime = self.start_date
-
-        while True:
-            new_df = self.get_binance_bars(
-                self.symbol, self.interval, last_datetime, self.end_date
+        # Coarser intervals are resampled from the cached base_interval bars
+        self.base_interval = None
+        if base_interval and interval_millis(interval) > interval_millis(base_interval):
+            self.base_interval = base_interval
+            self.cache = ResampledCache(self.cache, base_interval)
+
+    def fetch_missing(self):
+        """Download the parts of the configured range the cache lacks"""
+        start, end = to_millis(self.start_date), to_millis(self.end_date)
+        # The bar still forming would be cached with its values so far
+        end = min(end, last_closed_bar(self.interval))
+        if self.base_interval:
+            base = DataHandler(
+                self.cache_dir,
+                self.symbol,
+                self.base_interval,
+                self.start_date,
+                self.end_date,
+                self.downloader,
+                compact=self.compact,
+            )
+            # The cached base bars are resampled even if they cannot be updated
+            base.refresh()
+            self.resample_cached()
+            return
+        if self.compact and self.cache.convert(self.symbol, self.interval):
+            print(
+                "Converted the cached %s %s bars to the compact format"
+                % (self.symbol, self.interval)
+            )
+        gaps = self.cache.missing_ranges(self.symbol, self.interval, start, end)
+        if gaps:
+            print(
+                "Fetching %d missing %s %s price range(s)..."
+                % (len(gaps), self.symbol, self.interval)
+            )
+        for gap_start, gap_end in gaps:
+            self.fetch_range(gap_start, gap_end)
+
+    def resample_cached(self):
+        """Resample what the cache lacks of the configured range from the
+        cached base_interval bars, without downloading"""
+        start, end = to_millis(self.start_date), to_millis(self.end_date)
+        self.cache.derive_missing(self.symbol, self.interval, start, end)
+
+    def read_cached(self):
+        """Column arrays of the configured range, as far as it is cached"""
+        start, end = to_millis(self.start_date), to_millis(self.end_date)
+        return self.cache.read(self.symbol, self.interval, start, end)
+
+    def iter_cached(self):
+        """Cached bars of the configured range, one month of arrays at a time"""
+        start, end = to_millis(self.start_date), to_millis(self.end_date)
+        return self.cache.iter_months(self.symbol, self.interval, start, end)
+
+    def refresh(self):
+        """fetch_missing, going on with the cached bars if that fails"""
+        try:
+            self.fetch_missing()
+        except Exception as e:
+            print(
+                "Could not fetch %s %s, using the cached bars: %s"
+                % (self.symbol, self.interval, e)
             )
-            if new_df is None:
-                break
-            df_list.append(new_df)
-            last_datetime = max(new_df.index) + dt.timedelta(hours=1)
 
-        df = pd.concat(df_list)
+    def load_or_fetch_arrays(self):
+        """Load cached bars as column arrays, fetching only what is missing"""
+        self.refresh()
+        print("Loading cached price data...")
+        return self.read_cached()
 
-        # Save data for future runs
-        with open(self.data_file, "wb") as f:
-            pickle.dump(df, f)
+    def load_or_fetch_data(self):
+        """Load cached data or fetch new data from Binance as a DataFrame"""
+        return self.to_frame(self.load_or_fetch_arrays())
 
-        return df
+    def fetch_range(self, start, end):
+        """Download the bars between two epoch ms stamps into the cache"""
+        arrays = self.get_binance_bars(
+            self.symbol, self.interval, from_millis(start), from_millis(end)
+        )
+        if arrays is not None:
+            self.cache.write(self.symbol, self.interval, arrays)
+
+        # What is still missing before the newest bar the exchange has is a
+        # gap in its history, e.g. an outage, and is not asked for again.
+        # Later bars may not be published yet
+        later = next(self.cache.iter_months(self.symbol, self.interval, end + 1), None)
+        if later is not None:
+            newest = end
+        elif arrays is not None:
+            newest = int(arrays["datetime"][-1])
+        else:
+            return
+        gaps = self.cache.missing_ranges(self.symbol, self.interval, start, end)
+        self.cache.mark_empty(
+            self.symbol,
+            self.interval,
+            [(gap_start, gap_end) for gap_start, gap_end in gaps if gap_end <= newest],
+        )
 
     @staticmethod
-    def get_binance_bars(symbol, interval, startTime, endTime):
-        """Fetch historical price data from Binance API"""
-        url = "https://api.binance.com/api/v3/klines"
-
-        startTime = str(int(startTime.timestamp() * 1000))
-        endTime = str(int(endTime.timestamp() * 1000))
-        limit = "1000"
-
-        req_params = {
-            "symbol": symbol,
-            "interval": interval,
-            "startTime": startTime,
-            "endTime": endTime,
-            "limit": limit,
-        }
-        a = json.loads(requests.get(url, params=req_params).text)
-        df = pd.DataFrame(a)
+    def to_frame(arrays):
+        """Build a price DataFrame from cached arrays"""
+        import pandas as pd
 
-        if len(df.index) == 0:
-            return None
-
-        df = df.iloc[:, 0:6]
-        df.columns = ["datetime", "open", "high", "low", "close", "volume"]
+        df = pd.DataFrame({column: arrays[column] for column in CACHE_COLUMNS})
+        df.index = pd.to_datetime(arrays["datetime"], unit="ms")
+        return df
 
-        df.open = df.open.astype("float")
-        df.high = df.high.astype("float")
-        df.low = df.low.astype("float")
-        df.close = df.close.astype("float")
-        df.volume = df.volume.astype("float")
+    def get_binance_bars(self, symbol, interval, startTime, endTime):
+        """Fetch historical price data from Binance API as column arrays"""
+        rows = self.downloader.fetch(
+            symbol, interval, to_millis(startTime), to_millis(endTime)
+        )
+        if not rows:
+            return None
+        return parse_klines(rows)
 
-        df["adj_close"] = df["close"]
-        df.index = [dt.datetime.fromtimestamp(x / 1000.0) for x in df.datetime]
 
-        return df
+STRATEGIES = {
+    "MaCross": MaCross,
+    "TripleSupertrend": TripleSupertrend,
+    "CrossoverStochRSI": CrossoverStochRSI,
+    "TripleEMaStrategy": TripleEMaStrategy,
+}
 
 
 class BacktestRunner:
-    def __init__(self, args, strategy_name):
+    def __init__(self, args, strategy_name, strategy_params=None):
         self.args = args
         self.strategy_name = strategy_name
-        self.cerebro = bt.Cerebro()
-        self.data_handler = DataHandler()
-
-    def setup_cerebro(self, df):
-        data = bt.feeds.PandasData(dataname=df)
-        self.cerebro.adddata(data)
-        if self.strategy_name == "MaCross":
-            self.cerebro.addstrategy(MaCross)
-        elif self.strategy_name == "TripleSupertrend":
-            self.cerebro.addstrategy(TripleSupertrend)
-        elif self.strategy_name == "CrossoverStochRSI":
-            self.cerebro.addstrategy(CrossoverStochRSI)
-        elif self.strategy_name == "TripleEMaStrategy":
-            self.cerebro.addstrategy(TripleEMaStrategy)
+        self.strategy_params = strategy_params or {}
+        # exactbars=1 sizes every line buffer to the lookback it needs
+        self.cerebro = bt.Cerebro(exactbars=1 if args.low_memory else False)
+        self.data_handler = DataHandler(compact=args.compact)
+
+    def setup_cerebro(self, arrays):
+        """Add data, strategy, sizer and analyzers.
+
+        arrays is a dict of column arrays, or a callable returning an
+        iterable of such dicts to stream the data chunk by chunk.
+        """
+        if callable(arrays):
+            data = ChunkedArrayData(dataname=arrays)
         else:
-            raise ValueError(f"Unknown strategy: {self.strategy_name}")
+            data = ArrayData(dataname=arrays)
+        self.cerebro.adddata(data)
+        for interval in self.args.timeframes:
+            self.cerebro.adddata(self.timeframe_data(arrays, interval), name=interval)
+        self.add_strategies()
         self.cerebro.broker.setcash(1000)
         self.cerebro.addsizer(bt.sizers.PercentSizer, percents=100)
-        self.cerebro.addanalyzer(btanalyzers.SharpeRatio, _name="sharpe")
-        self.cerebro.addanalyzer(btanalyzers.DrawDown, _name="drawdown")
-        self.cerebro.addanalyzer(btanalyzers.Returns, _name="returns")
-        self.cerebro.addanalyzer(btanalyzers.TradeAnalyzer, _name="trade_analyzer")
+        # The metrics are computed from the recorded equity curve after the run
+        self.cerebro.addanalyzer(EquityRecorder, _name="equity")
+
+    def timeframe_data(self, arrays, interval):
+        """Feed of the run's bars resampled to a coarser interval.
+
+        An interval bar is delivered with the base bar that completes it.
+        """
+        handler = self.data_handler
+        if callable(arrays):
+            # Streamed runs read the resampled series from its own cache,
+            # up to the bar completed by the last bar of the run
+            shift = interval_millis(interval) - interval_millis(handler.interval)
+            resampled = DataHandler(
+                handler.cache_dir,
+                handler.symbol,
+                interval,
+                handler.start_date,
+                handler.end_date - dt.timedelta(milliseconds=shift),
+                handler.downloader,
+                base_interval=handler.base_interval or handler.interval,
+                compact=handler.compact,
+            )
+            resampled.resample_cached()
+            bars = resampled.read_cached()
+        else:
+            bars = resample(arrays, interval, handler.interval)
+        return ArrayData(dataname=close_stamped(bars, interval, handler.interval))
 
-    def run_backtest(self):
-        return self.cerebro.run()
+    def add_strategies(self):
+        if self.strategy_name not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {self.strategy_name}")
+        self.cerebro.addstrategy(STRATEGIES[self.strategy_name], **self.strategy_params)
+
+    def run_key(self, fingerprint):
+        """Result store key of the set up run on data with fingerprint"""
+        return run_key(
+            STRATEGIES[self.strategy_name],
+            self.strategy_params,
+            cerebro_settings(self.cerebro),
+            fingerprint,
+        )
 
-    def analyze_results(self, results):
-        strat = results[0]
-        print("Final Portfolio Value: %.2f" % self.cerebro.broker.getvalue())
+    def run_info(self, data_info):
+        """Description of the run stored next to its metrics.
+
+        data_info is the (fingerprint, bars, start, end) of data_fingerprint.
+        """
+        _, bars, start, end = data_info
+        return {
+            "strategy": self.strategy_name,
+            "params": strategy_params(
+                STRATEGIES[self.strategy_name], self.strategy_params
+            ),
+            "symbol": self.data_handler.symbol,
+            "interval": self.data_handler.interval,
+            "start": start,
+            "end": end,
+            "bars": bars,
+        }
+
+    def run_backtest(self):
+        if not self.args.profile:
+            return self.cerebro.run()
+
+        from profiling import Profiler
+
+        profiler = Profiler()
+        with profiler.instrument(self.cerebro):
+            results = self.cerebro.run()
+        profiler.print_report()
+        if self.args.flamegraph:
+            profiler.write_folded(self.args.flamegraph)
+            print("Folded stacks saved to %s" % self.args.flamegraph)
+        return results
+
+    def get_metrics(self, results):
+        """Collect the headline numbers of a finished run into a dict"""
+        metrics = compute_metrics(results[0].analyzers.equity.get_analysis())
+        return dict(metrics, final_value=results[0].broker.getvalue())
+
+    def get_equity(self, results):
+        """Equity curve of a finished run as datetime and value arrays.
+
+        None for a --low-memory run, which keeps no curve.
+        """
+        analysis = results[0].analyzers.equity.get_analysis()
+        return None if analysis["curve"] is not None else analysis
+
+    def analyze_results(self, metrics):
+        print("Final Portfolio Value: %.2f" % metrics["final_value"])
         print("\n--- Strategy Analysis ---")
+        print("Winrate: %.2f%%" % (metrics["winrate"] * 100))
+        print("Sharpe Ratio:", metrics["sharpe"])
+        print("Max Drawdown: %.2f%%" % metrics["max_drawdown"])
+        print("Total Return: %.2f%%" % (metrics["total_return"] * 100))
+        # Runs stored before these metrics existed do not have them
+        print("Sortino Ratio:", metrics.get("sortino"))
+        print("Calmar Ratio:", metrics.get("calmar"))
+        if metrics.get("exposure") is not None:
+            print("Exposure: %.2f%%" % (metrics["exposure"] * 100))
+
+    def resample_trades(self, results):
+        if self.args.monte_carlo:
+            from montecarlo import run_monte_carlo
+
+            run_monte_carlo(self.args, results[0].analyzers.equity.get_analysis())
 
-        # Calculate winrate
-        trade_analysis = strat.analyzers.trade_analyzer.get_analysis()
-        if "won" in trade_analysis and "total" in trade_analysis.won:
-            won_trades = trade_analysis.won.total
-        else:
-            won_trades = 0
-        if "lost" in trade_analysis and "total" in trade_analysis.lost:
-            lost_trades = trade_analysis.lost.total
-        else:
-            lost_trades = 0
+    def plot_results(self):
+        if self.args.plot and self.args.fast_plot:
+            from fastplot import plot_run
 
-        if won_trades + lost_trades > 0:
-            winrate = won_trades / (won_trades + lost_trades)
-        else:
-            winrate = 0
+            path = "btc_strategy_plot.png" if self.args.save_plot else None
+            plot_run(self.cerebro.runstrats[0][0], path)
+            if path:
+                print("Plot saved to %s" % path)
+        elif self.args.plot:
+            # Only plotting runs pay for importing matplotlib
+            import matplotlib.pyplot as plt
 
-        print("Winrate: %.2f%%" % (winrate * 100))
-        print("Sharpe Ratio:", strat.analyzers.sharpe.get_analysis()["sharperatio"])
-        print(
-            "Max Drawdown: %.2f%%"
-            % strat.analyzers.drawdown.get_analysis()["max"]["drawdown"]
-        )
-        print(
-            "Total Return: %.2f%%"
-            % (strat.analyzers.returns.get_analysis()["rtot"] * 100)
-        )
-
-    def plot_results(self):
-        if self.args.plot:
             plt.rcParams["figure.figsize"] = [40, 20]
             plt.rcParams["savefig.dpi"] = 300
             figure = self.cerebro.plot(style="candlebars", iplot=False)[0][0]
@@ -168,13 +330,92 @@ class BacktestRunner:
             print("Cannot save plot when --no-plot is specified.")
 
     def run(self):
-        df = self.data_handler.load_or_fetch_data()
-        self.setup_cerebro(df)
+        if self.args.low_memory:
+            # Stream the cache month by month instead of loading it whole
+            self.data_handler.refresh()
+            arrays = self.data_handler.iter_cached
+            chunks = arrays()
+        else:
+            arrays = self.data_handler.load_or_fetch_arrays()
+            chunks = [arrays]
+        self.setup_cerebro(arrays)
+
+        if not self.args.results:
+            results = self.run_backtest()
+            self.analyze_results(self.get_metrics(results))
+            self.resample_trades(results)
+            self.plot_results()
+            return
+
+        store = ResultStore(self.args.results)
+        data_info = data_fingerprint(chunks)
+        key = self.run_key(data_info[0])
+        # Plots, profiles and Monte Carlo runs need the run itself, not just
+        # its numbers
+        reuse = not (
+            self.args.rerun
+            or self.args.plot
+            or self.args.profile
+            or self.args.monte_carlo
+        )
+        metrics = store.get(key) if reuse else None
+        if metrics is not None:
+            print("Stored result of an identical run %s" % key[:12])
+            self.analyze_results(metrics)
+            store.close()
+            return
+
         results = self.run_backtest()
-        self.analyze_results(results)
+        metrics = self.get_metrics(results)
+        store.put(key, self.run_info(data_info), metrics, self.get_equity(results))
+        store.close()
+        self.analyze_results(metrics)
+        self.resample_trades(results)
         self.plot_results()
 
 
+def parse_value(text):
+    """Convert a command line parameter value to int, float or bool"""
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    return text
+
+
+def parse_grid(specs):
+    """Turn NAME=VALUES specs into a {name: [values]} grid.
+
+    VALUES is either a comma separated list or a start:stop:step range
+    (stop inclusive).
+    """
+    grid = {}
+    for spec in specs:
+        name, sep, values = spec.partition("=")
+        if not sep or not values:
+            raise ValueError(f"Invalid parameter spec: {spec!r}")
+        if ":" in values:
+            start, stop, step = (parse_value(v) for v in values.split(":"))
+            count = int(round((stop - start) / step)) + 1
+            grid[name] = [start + i * step for i in range(count)]
+        else:
+            grid[name] = [parse_value(v) for v in values.split(",")]
+    return grid
+
+
+def parse_params(specs):
+    """Like parse_grid, but every parameter must have a single value"""
+    params = {}
+    for name, values in parse_grid(specs).items():
+        if len(values) != 1:
+            raise ValueError(f"Use --sweep to run several values of {name}")
+        params[name] = values[0]
+    return params
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Backtesting script with plot options."
@@ -191,6 +432,13 @@ def main():
         action="store_true",
         help="Save the plot to a file (btc_strategy_plot.png).",
     )
+    parser.add_argument(
+        "--fast-plot",
+        dest="fast_plot",
+        action="store_true",
+        help="Draw a decimated chart of the price, indicators, trades and value "
+        "that renders in seconds on long histories.",
+    )
     parser.add_argument(
         "--strategy",
         dest="strategy_name",
@@ -200,8 +448,231 @@ def main():
             "TripleSupertrend",
             "CrossoverStochRSI",
             "TripleEMaStrategy",
+            "all",
         ],
-        help="Name of the strategy to use.",
+        help="Name of the strategy to use. all runs every strategy side by side "
+        "in one pass over the data.",
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="Run a parameter sweep over the --param grids in a process pool.",
+    )
+    parser.add_argument(
+        "--param",
+        dest="params",
+        action="append",
+        default=[],
+        metavar="NAME=VALUES",
+        help="Strategy parameter, e.g. fast_length=20,50 or slow_length=100:300:50. "
+        "Repeat for several parameters.",
+    )
+    parser.add_argument(
+        "--prescreen",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Rank the sweep with the vectorized engine and only run the best N "
+        "combinations through Cerebro.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of sweep or batch worker processes (default: all cores).",
+    )
+    parser.add_argument(
+        "--optimize",
+        choices=["grid", "random", "halving"],
+        default=None,
+        help="Search the --param grids: every combination, a random --samples "
+        "subset, or successive halving over doubling data prefixes.",
+    )
+    parser.add_argument(
+        "--objective",
+        choices=["return", "sharpe", "sortino", "calmar", "return_drawdown"],
+        default="return",
+        help="What --optimize maximizes (default: return). The yearly Sharpe "
+        "ratio cannot rank prefixes shorter than two calendar years.",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=None,
+        help="Combinations drawn by the random and halving samplers "
+        "(default: the whole grid).",
+    )
+    parser.add_argument(
+        "--keep",
+        type=float,
+        default=0.5,
+        help="Fraction of the candidates a halving round keeps (default: 0.5).",
+    )
+    parser.add_argument(
+        "--min-bars",
+        dest="min_bars",
+        type=int,
+        default=2000,
+        help="Shortest data prefix of a halving round (default: 2000).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the random sampler and --monte-carlo (default: 0).",
+    )
+    parser.add_argument(
+        "--walk-forward",
+        dest="walk_forward",
+        action="store_true",
+        help="Optimize the --param grids on rolling in-sample windows and report "
+        "the stitched out-of-sample run.",
+    )
+    parser.add_argument(
+        "--train-bars",
+        dest="train_bars",
+        type=int,
+        default=24 * 180,
+        help="In-sample bars of a --walk-forward window (default: 4320).",
+    )
+    parser.add_argument(
+        "--test-bars",
+        dest="test_bars",
+        type=int,
+        default=24 * 30,
+        help="Out-of-sample bars of a --walk-forward window (default: 720).",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Backtest every --symbols x --intervals x --strategies combination "
+        "in a process pool.",
+    )
+    parser.add_argument(
+        "--symbols",
+        nargs="+",
+        default=["BTCUSDT"],
+        help="Symbols of a --batch run (default: BTCUSDT).",
+    )
+    parser.add_argument(
+        "--intervals",
+        nargs="+",
+        default=["1h"],
+        help="Intervals of a --batch run (default: 1h).",
+    )
+    parser.add_argument(
+        "--strategies",
+        nargs="+",
+        default=None,
+        choices=list(STRATEGIES),
+        help="Strategies of a --batch run (default: the --strategy one). "
+        "Without --batch, run them and their --param variants side by side in "
+        "one pass over the data.",
+    )
+    parser.add_argument(
+        "--base-interval",
+        dest="base_interval",
+        default=None,
+        help="Resample the coarser --intervals of a --batch run from the cached "
+        "bars of this interval instead of downloading them, e.g. 1h.",
+    )
+    parser.add_argument(
+        "--timeframes",
+        nargs="+",
+        default=[],
+        metavar="INTERVAL",
+        help="Also feed the run's bars resampled to these coarser intervals, as "
+        "datas[1], datas[2], ... for higher timeframe filters.",
+    )
+    parser.add_argument(
+        "--monte-carlo",
+        dest="monte_carlo",
+        type=int,
+        default=None,
+        metavar="PATHS",
+        help="Resample the closed trades of the run on PATHS paths per --mc-method "
+        "and report the drawdown and return distributions.",
+    )
+    parser.add_argument(
+        "--mc-method",
+        dest="mc_methods",
+        nargs="+",
+        choices=["bootstrap", "shuffle", "slippage"],
+        default=["bootstrap", "shuffle", "slippage"],
+        help="Draw the trades with replacement, reorder them, or charge random "
+        "entry and exit costs (default: all three).",
+    )
+    parser.add_argument(
+        "--slippage",
+        type=float,
+        default=0.001,
+        help="Mean cost of an entry or exit of --mc-method slippage, as a "
+        "fraction of the price (default: 0.001).",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Store the cached prices and volumes as float32 where that loses "
+        "nothing, which cuts the cache by up to 40%%. Runs read the same bars. "
+        "Converts the cached series of the run.",
+    )
+    parser.add_argument(
+        "--low-memory",
+        dest="low_memory",
+        action="store_true",
+        help="Stream the price data and keep only the bars each line needs to "
+        "look back, for very long histories. Disables plotting.",
+    )
+    parser.add_argument(
+        "--results",
+        metavar="FILE",
+        default="results.sqlite",
+        help="SQLite store of finished runs, identical runs are not repeated "
+        "(default: results.sqlite). Pass an empty string to disable.",
+    )
+    parser.add_argument(
+        "--rerun",
+        action="store_true",
+        help="Run even if the result store holds an identical run.",
+    )
+    parser.add_argument(
+        "--list-runs",
+        dest="list_runs",
+        action="store_true",
+        help="Print the stored runs of --strategy, best total return first.",
+    )
+    parser.add_argument(
+        "--stream",
+        metavar="CHECKPOINT",
+        default=None,
+        help="Run --strategy incrementally: resume the run saved in CHECKPOINT "
+        "with the bars cached since, or start it over the whole history.",
+    )
+    parser.add_argument(
+        "--listen",
+        metavar="HOST:PORT",
+        default=None,
+        help="With --stream, then run the JSON bars a live feed sends on "
+        "HOST:PORT, checkpointing after every bar.",
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="HOST:PORT",
+        default=None,
+        help="Run a local backtest service that keeps the imports and price data "
+        "in memory, for client.py (e.g. 127.0.0.1:8765).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time indicators, strategy, broker and analyzers and print the hot "
+        "paths.",
+    )
+    parser.add_argument(
+        "--flamegraph",
+        metavar="FILE",
+        default=None,
+        help="With --profile, also write folded stacks for flamegraph.pl to FILE.",
     )
     parser.set_defaults(plot=True)
     args = parser.parse_args()
@@ -211,7 +682,75 @@ def main():
     else:
         args.save_plot = False
 
-    runner = BacktestRunner(args, args.strategy_name)
+    if args.low_memory and args.plot:
+        print("Plotting is disabled with --low-memory")
+        args.plot = args.save_plot = False
+
+    # Several strategies outside --batch run side by side in one pass
+    several = not args.batch and (args.strategy_name == "all" or bool(args.strategies))
+    if several:
+        if (
+            args.sweep
+            or args.optimize
+            or args.walk_forward
+            or args.stream
+            or args.monte_carlo
+        ):
+            parser.error("several strategies can only run side by side or in --batch")
+        if args.plot:
+            print("Plotting is disabled with several strategies")
+            args.plot = args.save_plot = False
+
+    if args.serve:
+        from server import run_server
+
+        run_server(args)
+        return
+
+    if args.list_runs:
+        store = ResultStore(args.results)
+        strategy = None if args.strategy_name == "all" else args.strategy_name
+        print_runs(store.query(strategy=strategy))
+        store.close()
+        return
+
+    if several:
+        from multirun import run_multi
+
+        run_multi(args)
+        return
+
+    if args.stream:
+        from stream import run_stream
+
+        run_stream(args)
+        return
+
+    if args.batch:
+        from batch import run_batch
+
+        run_batch(args)
+        return
+
+    if args.optimize:
+        from optimize import run_optimize
+
+        run_optimize(args)
+        return
+
+    if args.walk_forward:
+        from walkforward import run_walk_forward
+
+        run_walk_forward(args)
+        return
+
+    if args.sweep:
+        from sweep import run_sweep
+
+        run_sweep(args)
+        return
+
+    runner = BacktestRunner(args, args.strategy_name, parse_params(args.params))
     runner.run()
 
 
@@ -0,0 +1,237 @@
+"""Performance metrics computed in one pass over a recorded equity curve.
+
+``compute_metrics`` takes the analysis of ``recorder.EquityRecorder``.
+Sharpe ratio, max drawdown, total return and win rate reproduce the
+numbers of backtrader's SharpeRatio, DrawDown, Returns and TradeAnalyzer
+analyzers with their default parameters, down to the summation order.
+Runs too long to keep their curve fold it into a ``RunningCurve`` instead.
+"""
+
+import math
+from collections import Counter
+
+import numpy as np
+
+YEAR_MILLIS = 365 * 86_400_000
+
+
+def yearly_returns(datetime, value, start_value):
+    """Return of every calendar year, as bt.analyzers.TimeReturn(Years)"""
+    if not len(value):
+        return np.empty(0)
+    years = np.asarray(datetime).astype("datetime64[ms]").astype("datetime64[Y]")
+    ends = np.append(np.flatnonzero(years[1:] != years[:-1]), len(value) - 1)
+    closes = value[ends]
+    opens = np.append(start_value, closes[:-1])
+    return closes / opens - 1.0
+
+
+def sharpe_ratio(datetime, value, start_value, riskfreerate=0.01):
+    """Yearly Sharpe ratio, as bt.analyzers.SharpeRatio with its defaults.
+
+    None for a run within a single year, like backtrader's.
+    """
+    returns = yearly_returns(datetime, value, start_value).tolist()
+    return _sharpe(returns, riskfreerate)
+
+
+def _sharpe(returns, riskfreerate=0.01):
+    if not returns:
+        return None
+    # backtrader converts the rate to the timeframe (factor 1 for years),
+    # which changes its last bit
+    rate = pow(1.0 + riskfreerate, 1.0 / 1) - 1.0
+    excess = [r - rate for r in returns]
+    average = math.fsum(excess) / len(excess)
+    deviation = math.sqrt(
+        math.fsum([pow(r - average, 2.0) for r in excess]) / len(excess)
+    )
+    try:
+        return average / deviation
+    except ZeroDivisionError:
+        return None
+
+
+def max_drawdown(value):
+    """Largest drop from a running peak in percent, as bt.analyzers.DrawDown"""
+    if not len(value):
+        return 0.0
+    peak = np.maximum.accumulate(value)
+    return max(0.0, float((100.0 * (peak - value) / peak).max()))
+
+
+def log_return(value, start_value):
+    """Log return of the whole run, as rtot of bt.analyzers.Returns"""
+    end_value = value[-1] if len(value) else start_value
+    try:
+        ratio = end_value / start_value
+    except ZeroDivisionError:
+        return float("-inf")
+    return float("-inf") if ratio < 0.0 else math.log(ratio)
+
+
+def periods_per_year(datetime):
+    """Bars per year, from the typical spacing of the bars"""
+    if len(datetime) < 2:
+        return None
+    return YEAR_MILLIS / float(np.median(np.diff(datetime)))
+
+
+def annual_return(datetime, value, start_value):
+    """Compound annual growth rate over the span of the bars"""
+    per_year = periods_per_year(datetime)
+    if per_year is None:
+        return None
+    return _annual_return(value[-1], len(value), start_value, per_year)
+
+
+def _annual_return(end_value, bars, start_value, per_year):
+    if end_value <= 0.0:
+        return None
+    years = bars / per_year
+    return (end_value / start_value) ** (1.0 / years) - 1.0
+
+
+def sortino_ratio(datetime, value, start_value):
+    """Annualized mean bar return over the downside deviation of bar returns"""
+    per_year = periods_per_year(datetime)
+    if per_year is None:
+        return None
+    returns = value / np.append(start_value, value[:-1]) - 1.0
+    downside = float(np.mean(np.minimum(returns, 0.0) ** 2))
+    return _sortino(float(returns.mean()), downside, per_year)
+
+
+def _sortino(mean, downside, per_year):
+    downside = math.sqrt(downside)
+    if not downside:
+        return None
+    return mean / downside * math.sqrt(per_year)
+
+
+class RunningCurve:
+    """What compute_metrics needs of an equity curve, updated bar by bar.
+
+    Keeps the drawdown peak, the sums of the bar returns, the value at
+    every year end and a count of every bar spacing instead of the curve,
+    so it takes the same memory however many bars are added. The metrics
+    match the ones of the kept curve, apart from the last bits of the
+    Sortino ratio, whose means are summed in another order.
+    """
+
+    def __init__(self, start_value):
+        self.start_value = start_value
+        self.bars = 0
+        self.end_value = start_value
+        self.last_millis = None
+        self.next_year = None
+        self.year_closes = []
+        self.spacings = Counter()
+        self.peak = None
+        self.drawdown = 0.0
+        self.return_sum = 0.0
+        self.downside_sum = 0.0
+
+    def add(self, millis, value):
+        """Add the value at the close of the bar opened at millis (epoch ms)"""
+        if self.last_millis is not None:
+            self.spacings[millis - self.last_millis] += 1
+            if millis >= self.next_year:
+                self.year_closes.append(self.end_value)
+        if self.last_millis is None or millis >= self.next_year:
+            year = np.datetime64(millis, "ms").astype("datetime64[Y]")
+            self.next_year = int((year + 1).astype("datetime64[ms]").astype(np.int64))
+
+        bar_return = value / self.end_value - 1.0
+        self.return_sum += bar_return
+        self.downside_sum += min(bar_return, 0.0) ** 2
+        self.peak = value if self.peak is None else max(self.peak, value)
+        self.drawdown = max(self.drawdown, 100.0 * (self.peak - value) / self.peak)
+        self.bars += 1
+        self.end_value = value
+        self.last_millis = millis
+
+    def periods_per_year(self):
+        """periods_per_year of the bars added, from the median spacing"""
+        count = sum(self.spacings.values())
+        if not count:
+            return None
+        middle = []
+        seen = 0
+        for spacing, times in sorted(self.spacings.items()):
+            seen += times
+            while (
+                len(middle) < 2 and seen > ((count - 1) // 2, count // 2)[len(middle)]
+            ):
+                middle.append(spacing)
+        return YEAR_MILLIS / ((middle[0] + middle[1]) / 2.0)
+
+    def yearly_returns(self):
+        if not self.bars:
+            return []
+        closes = self.year_closes + [self.end_value]
+        opens = [self.start_value] + closes[:-1]
+        return [close / open_ - 1.0 for close, open_ in zip(closes, opens)]
+
+
+def calmar_ratio(growth, drawdown):
+    """Annual return over the max drawdown, which is given in percent"""
+    if growth is None or not drawdown:
+        return None
+    return growth / (drawdown / 100.0)
+
+
+def curve_metrics(curve):
+    """The equity curve metrics of compute_metrics from a RunningCurve"""
+    per_year = curve.periods_per_year()
+    growth = sortino = None
+    if per_year is not None:
+        growth = _annual_return(
+            curve.end_value, curve.bars, curve.start_value, per_year
+        )
+        sortino = _sortino(
+            curve.return_sum / curve.bars, curve.downside_sum / curve.bars, per_year
+        )
+    return {
+        "sharpe": _sharpe(curve.yearly_returns()),
+        "max_drawdown": max(0.0, curve.drawdown),
+        "total_return": log_return([curve.end_value], curve.start_value),
+        "annual_return": growth,
+        "sortino": sortino,
+    }
+
+
+def compute_metrics(analysis):
+    """Headline metrics of a run from the EquityRecorder analysis"""
+    trades = analysis["trades"]
+    curve = analysis.get("curve")
+    if curve is None:
+        datetime = analysis["datetime"]
+        value = analysis["value"]
+        start_value = analysis["start_value"]
+        bars = len(value)
+        metrics = {
+            "sharpe": sharpe_ratio(datetime, value, start_value),
+            "max_drawdown": max_drawdown(value),
+            "total_return": log_return(value, start_value),
+            "annual_return": annual_return(datetime, value, start_value),
+            "sortino": sortino_ratio(datetime, value, start_value),
+        }
+    else:
+        bars = curve.bars
+        metrics = curve_metrics(curve)
+
+    won = int(np.count_nonzero(trades["pnlcomm"] >= 0.0))
+    closed = len(trades)
+    return {
+        "trades": closed,
+        "winrate": won / closed if closed else 0,
+        "sharpe": metrics["sharpe"],
+        "max_drawdown": metrics["max_drawdown"],
+        "total_return": metrics["total_return"],
+        "annual_return": metrics["annual_return"],
+        "sortino": metrics["sortino"],
+        "calmar": calmar_ratio(metrics["annual_return"], metrics["max_drawdown"]),
+        # Share of the bars spent in a trade that was closed by the end
+        "exposure": int(trades["bars"].sum()) / bars if bars else 0.0,
+    }
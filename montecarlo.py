@@ -0,0 +1,173 @@
+"""Monte Carlo robustness of a run from the sequence of its closed trades.
+
+    python main.py --strategy MaCross --monte-carlo 20000 --no-plot
+
+Every closed trade becomes the return it made on the equity it was
+opened with. Thousands of alternative trade sequences are then drawn at
+once as (paths, trades) matrices:
+
+* ``bootstrap`` draws the trades with replacement,
+* ``shuffle`` reorders them, which keeps the total return but not the
+  drawdowns on the way,
+* ``slippage`` keeps the order and charges every entry and exit a random
+  cost of up to twice ``--slippage``.
+
+The equity after every trade, its drawdowns and the total return of each
+path are computed with cumulative NumPy operations over the matrices.
+The paths are cut into fixed size chunks that each have their own seed
+spawned from ``--seed``, and the chunks are spread over a process pool,
+so the distributions do not depend on the number of workers.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+METHODS = ("bootstrap", "shuffle", "slippage")
+
+# Paths of one chunk, a (paths, trades) float64 matrix stays small
+CHUNK_PATHS = 2000
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def trade_returns(trades, start_value):
+    """Return of every closed trade on the equity before it.
+
+    trades is a recorder TRADE_DTYPE array in closing order. The equity
+    before a trade is the start value plus the pnl of the trades closed
+    earlier, which is exact while at most one trade is open at a time.
+    """
+    pnl = np.asarray(trades["pnlcomm"], dtype=np.float64)
+    before = start_value + np.concatenate(([0.0], np.cumsum(pnl)[:-1]))
+    return pnl / before
+
+
+def resample_returns(returns, method, paths, rng, slippage=0.001):
+    """(paths, trades) matrix of resampled trade returns"""
+    n = len(returns)
+    if method == "bootstrap":
+        return returns[rng.integers(0, n, size=(paths, n))]
+    if method == "shuffle":
+        return returns[rng.permuted(np.broadcast_to(np.arange(n), (paths, n)), axis=1)]
+    if method == "slippage":
+        costs = rng.uniform(0.0, 2.0 * slippage, size=(2, paths, n))
+        return (1.0 + returns) * (1.0 - costs[0]) * (1.0 - costs[1]) - 1.0
+    raise ValueError(f"Unknown Monte Carlo method: {method}")
+
+
+def path_metrics(returns):
+    """Max drawdown (percent) and log return of every row of trade returns.
+
+    The drawdown is measured on the equity after every trade, so it leaves
+    out the swings while a trade is open.
+    """
+    equity = np.cumprod(1.0 + returns, axis=1)
+    # The start value is the first peak
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+    drawdown = np.maximum(100.0 * (peak - equity) / peak, 0.0).max(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = np.log(np.where(equity[:, -1] > 0.0, equity[:, -1], -np.inf))
+    return drawdown, np.nan_to_num(total, nan=-np.inf)
+
+
+def _simulate(returns, method, paths, seed, slippage):
+    """Metrics of one chunk of paths, run in a worker process"""
+    rng = np.random.default_rng(seed)
+    return path_metrics(resample_returns(returns, method, paths, rng, slippage))
+
+
+def monte_carlo(
+    returns, methods=METHODS, paths=10000, seed=0, slippage=0.001, workers=None
+):
+    """Drawdown and return distributions of every method.
+
+    Returns {method: {"max_drawdown": array, "total_return": array}} with
+    one value per path. The same seed gives the same paths for any number
+    of workers.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if not len(returns):
+        raise ValueError("The run has no closed trades to resample")
+    sizes = [CHUNK_PATHS] * (paths // CHUNK_PATHS)
+    if paths % CHUNK_PATHS:
+        sizes.append(paths % CHUNK_PATHS)
+    seeds = np.random.SeedSequence(seed).spawn(len(methods) * len(sizes))
+
+    jobs = [
+        (method, size, seeds[i * len(sizes) + j])
+        for i, method in enumerate(methods)
+        for j, size in enumerate(sizes)
+    ]
+    workers = min(workers or os.cpu_count(), len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_simulate, returns, method, size, s, slippage)
+                for method, size, s in jobs
+            ]
+            chunks = [future.result() for future in futures]
+    else:
+        chunks = [
+            _simulate(returns, method, size, s, slippage) for method, size, s in jobs
+        ]
+
+    results = {}
+    for i, method in enumerate(methods):
+        own = chunks[i * len(sizes) : (i + 1) * len(sizes)]
+        results[method] = {
+            "max_drawdown": np.concatenate([drawdown for drawdown, _ in own]),
+            "total_return": np.concatenate([total for _, total in own]),
+        }
+    return results
+
+
+def print_distributions(results, actual):
+    """Percentiles of every method's metrics next to the run's own values"""
+    header = "%-10s %-13s %9s" + " %9s" * (len(PERCENTILES) + 1)
+    print(
+        header
+        % (("Method", "Metric", "Run", "Mean") + tuple("P%d" % p for p in PERCENTILES))
+    )
+    for method, metrics in results.items():
+        for name, values in metrics.items():
+            finite = values[np.isfinite(values)]
+            if name == "total_return":
+                # Log returns as percent, like analyze_results
+                finite, run = finite * 100, actual[name] * 100
+            else:
+                run = actual[name]
+            row = [finite.mean()] + list(np.percentile(finite, PERCENTILES))
+            print(
+                "%-10s %-13s %9.2f" % (method, name, run)
+                + " %9.2f" * len(row) % tuple(row)
+            )
+        losses = np.mean(metrics["total_return"] < 0.0)
+        print("%-10s %-13s %9s %9.2f%%" % (method, "P(loss)", "", losses * 100))
+
+
+def run_monte_carlo(args, analysis):
+    """Resample the trades of a run's EquityRecorder analysis and report"""
+    returns = trade_returns(analysis["trades"], analysis["start_value"])
+    actual = dict(zip(("max_drawdown", "total_return"), path_metrics(returns[None])))
+    actual = {name: float(values[0]) for name, values in actual.items()}
+
+    print(
+        "\nResampling %d trades on %d paths per method..."
+        % (len(returns), args.monte_carlo)
+    )
+    started = time.perf_counter()
+    results = monte_carlo(
+        returns,
+        args.mc_methods,
+        args.monte_carlo,
+        args.seed,
+        args.slippage,
+        args.workers,
+    )
+    print("Finished in %.1fs" % (time.perf_counter() - started))
+    print("\n--- Monte Carlo (drawdown and return after every trade, %) ---")
+    print_distributions(results, actual)
+    return results
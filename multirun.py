@@ -0,0 +1,163 @@
+"""Several strategies and parameter variants in one pass over one data feed.
+
+    python main.py --strategy all
+    python main.py --strategies MaCross TripleEMaStrategy --param fast_length=20,50
+
+Every variant trades on its own broker of a ``MultiBroker``, so cash and
+positions stay apart, while the feed is loaded, advanced and synchronized
+once per bar for all of them and shared indicators are computed once. The
+variants are stored and reported under the keys their single runs have.
+"""
+
+import contextlib
+import os
+import time
+
+import backtrader as bt
+
+from main import STRATEGIES, BacktestRunner
+from result_store import ResultStore, data_fingerprint, print_runs
+from sweep import expand_grid
+
+
+class MultiBroker(bt.brokers.BackBroker):
+    """Broker that hands every strategy of a run its own BackBroker.
+
+    The brokers take the cash, commission and other settings made on this
+    one. It runs them on every bar and passes on their notifications,
+    ``getcash`` and ``getvalue`` return their totals.
+    """
+
+    def init(self):
+        super().init()
+        self.brokers = []
+
+    def broker_for(self, owner):
+        """A new broker for the strategy owner, set up like this one"""
+        broker = bt.brokers.BackBroker(**self.params._getkwargs())
+        broker.cerebro = self.cerebro
+        broker.start()
+        broker.comminfo = dict(self.comminfo)
+        self.brokers.append(broker)
+        return broker
+
+    def stop(self):
+        for broker in self.brokers:
+            broker.stop()
+        super().stop()
+
+    def next(self):
+        for broker in self.brokers:
+            broker.next()
+
+    def get_notification(self):
+        for broker in self.brokers:
+            order = broker.get_notification()
+            if order is not None:
+                return order
+        return None
+
+    def get_cash(self):
+        if not self.brokers:
+            return super().get_cash()
+        return sum(broker.get_cash() for broker in self.brokers)
+
+    def get_value(self, datas=None, mkt=False, lever=False):
+        if not self.brokers:
+            return super().get_value(datas, mkt, lever)
+        return sum(broker.get_value(datas, mkt, lever) for broker in self.brokers)
+
+    getcash = get_cash
+    getvalue = get_value
+
+
+class MultiRunner(BacktestRunner):
+    """BacktestRunner of several (strategy name, params) variants at once"""
+
+    def __init__(self, args, variants):
+        super().__init__(args, *variants[0])
+        self.variants = variants
+        self.cerebro.broker = MultiBroker()
+
+    def add_strategies(self):
+        for name, params in self.variants:
+            if name not in STRATEGIES:
+                raise ValueError(f"Unknown strategy: {name}")
+            self.cerebro.addstrategy(STRATEGIES[name], **params)
+
+
+def strategy_variants(names, grid):
+    """(name, params) of every strategy and grid combination of its params.
+
+    A strategy only varies the grid parameters it has.
+    """
+    unknown = set(grid)
+    variants = []
+    for name in names:
+        own = {
+            param: values
+            for param, values in grid.items()
+            if param in STRATEGIES[name].params._getkeys()
+        }
+        unknown -= set(own)
+        variants.extend((name, params) for params in expand_grid(own))
+    if unknown:
+        raise ValueError("No strategy has parameter(s) %s" % ", ".join(sorted(unknown)))
+    return variants
+
+
+def run_multi(args):
+    from main import DataHandler, parse_grid
+
+    names = list(STRATEGIES) if args.strategy_name == "all" else args.strategies
+    variants = strategy_variants(names, parse_grid(args.params))
+
+    handler = DataHandler(compact=args.compact)
+    if args.low_memory:
+        handler.refresh()
+        arrays = handler.iter_cached
+        chunks = arrays()
+    else:
+        arrays = handler.load_or_fetch_arrays()
+        chunks = [arrays]
+    data_info = data_fingerprint(chunks)
+
+    store = ResultStore(args.results) if args.results else None
+    reuse = store is not None and not (args.rerun or args.profile)
+    runs, infos, pending = [], [], []
+    for name, params in variants:
+        runner = BacktestRunner(args, name, params)
+        runner.setup_cerebro(arrays)
+        key = runner.run_key(data_info[0])
+        infos.append(runner.run_info(data_info))
+        metrics = store.get(key) if reuse else None
+        runs.append(dict(infos[-1], key=key, **(metrics or {})))
+        if metrics is None:
+            pending.append(len(runs) - 1)
+
+    if pending:
+        print(
+            "Running %d of %d variants in one pass over %d bars..."
+            % (len(pending), len(variants), data_info[1])
+        )
+        runner = MultiRunner(args, [variants[i] for i in pending])
+        runner.setup_cerebro(arrays)
+        started = time.perf_counter()
+        # Keep the strategies' order logs out of the side by side table
+        with open(os.devnull, "w") as devnull, contextlib.ExitStack() as stack:
+            if not args.profile:
+                stack.enter_context(contextlib.redirect_stdout(devnull))
+            results = runner.run_backtest()
+        print("Finished in %.1fs" % (time.perf_counter() - started))
+        for i, strategy in zip(pending, results):
+            metrics = runner.get_metrics([strategy])
+            runs[i].update(metrics)
+            if store is not None:
+                equity = runner.get_equity([strategy])
+                store.put(runs[i]["key"], infos[i], metrics, equity)
+    if store is not None:
+        store.close()
+
+    print("\n--- Side by Side ---")
+    print_runs(runs)
+    return runs
@@ -0,0 +1,200 @@
+"""Parameter optimization with grid, random and successive halving samplers.
+
+Successive halving runs every candidate on a short prefix of the series,
+keeps the best ``keep`` fraction by the objective and doubles the prefix
+each round, so only the last few survivors run on the full range:
+
+    python main.py --optimize halving --strategy TripleSupertrend \\
+        --param take_profit=0.04:0.12:0.02 --param stop_loss=0.02:0.06:0.01
+
+All runs are Cerebro runs in the sweep's worker pool, on prefixes of the
+one shared copy of the price data.
+"""
+
+import contextlib
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from sweep import SharedPriceData, _init_worker, expand_grid
+
+
+def _objective(metric):
+    def score(metrics):
+        value = metrics[metric]
+        return -math.inf if value is None else value
+
+    return score
+
+
+def return_drawdown(metrics):
+    """Total return per unit of max drawdown"""
+    drawdown = metrics["max_drawdown"] / 100.0
+    return metrics["total_return"] / drawdown if drawdown else metrics["total_return"]
+
+
+# Objectives map a metrics dict to a score, higher is better
+OBJECTIVES = {
+    "return": _objective("total_return"),
+    "sharpe": _objective("sharpe"),
+    "sortino": _objective("sortino"),
+    "calmar": _objective("calmar"),
+    "return_drawdown": return_drawdown,
+}
+
+
+def grid_sampler(grid, samples=None, seed=0):
+    """Every combination of the grid"""
+    return expand_grid(grid)
+
+
+def random_sampler(grid, samples=None, seed=0):
+    """samples distinct combinations drawn uniformly from the grid"""
+    combinations = expand_grid(grid)
+    if samples is None or samples >= len(combinations):
+        return combinations
+    return random.Random(seed).sample(combinations, samples)
+
+
+def halving_schedule(candidates, bars, keep=0.5, min_bars=2000):
+    """(candidates, prefix bars) of every successive halving round.
+
+    The prefix doubles every round and ends at the full range, there are
+    as many rounds as the prefix can be halved down to min_bars and the
+    candidates can be cut by keep while at least one survives.
+    """
+    rounds = 1
+    while bars >> rounds >= min_bars and int(candidates * keep**rounds) >= 1:
+        rounds += 1
+    schedule = []
+    for r in range(rounds):
+        schedule.append((candidates, bars >> (rounds - 1 - r)))
+        candidates = max(1, int(candidates * keep))
+    return schedule
+
+
+def _run_prefix(args, strategy_name, params, bars):
+    import sweep
+    from main import BacktestRunner
+
+    arrays = {column: array[:bars] for column, array in sweep._worker_arrays.items()}
+    runner = BacktestRunner(args, strategy_name, params)
+    runner.setup_cerebro(arrays)
+    # Keep the strategies' order logs out of the round reports
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = runner.run_backtest()
+    return runner.get_metrics(results)
+
+
+class Optimizer:
+    """Runs candidate params of a strategy on prefixes of the price data"""
+
+    def __init__(self, args, strategy_name, arrays, objective, workers=None):
+        self.args = args
+        self.strategy_name = strategy_name
+        self.bars = len(arrays["datetime"])
+        self.objective = objective
+        # Number of runs and bars run, to tell the cost against a full grid
+        self.runs = 0
+        self.bar_runs = 0
+        self._shared = SharedPriceData(arrays)
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(self._shared.spec,),
+        )
+
+    def close(self):
+        self._pool.shutdown()
+        self._shared.close()
+
+    def evaluate(self, candidates, bars=None):
+        """(score, params, metrics) of every candidate, best first"""
+        bars = bars or self.bars
+        futures = [
+            self._pool.submit(_run_prefix, self.args, self.strategy_name, params, bars)
+            for params in candidates
+        ]
+        self.runs += len(futures)
+        self.bar_runs += len(futures) * bars
+        rows = []
+        for params, future in zip(candidates, futures):
+            metrics = future.result()
+            rows.append((self.objective(metrics), params, metrics))
+        # Stable, so ties keep the sampler's order
+        rows.sort(key=lambda row: row[0], reverse=True)
+        return rows
+
+    def successive_halving(self, candidates, keep=0.5, min_bars=2000):
+        schedule = halving_schedule(len(candidates), self.bars, keep, min_bars)
+        for count, bars in schedule:
+            candidates = candidates[:count]
+            print("  round: %d candidates on %d of %d bars" % (count, bars, self.bars))
+            rows = self.evaluate(candidates, bars)
+            candidates = [params for _, params, _ in rows]
+        return rows
+
+
+def print_ranking(rows, objective_name, limit=10):
+    print("\n--- Optimization Results (by %s) ---" % objective_name)
+    for score, params, metrics in rows[:limit]:
+        label = " ".join(f"{k}={v}" for k, v in params.items())
+        sharpe = metrics["sharpe"]
+        print(
+            "%-40s score %9.4f  return %8.2f%%  drawdown %6.2f%%  sharpe %s"
+            % (
+                label,
+                score,
+                metrics["total_return"] * 100,
+                metrics["max_drawdown"],
+                "-" if sharpe is None else "%.3f" % sharpe,
+            )
+        )
+
+
+SAMPLERS = {
+    "grid": grid_sampler,
+    "random": random_sampler,
+    # Successive halving starts from a random sample, or the whole grid
+    "halving": random_sampler,
+}
+
+
+def run_optimize(args):
+    from main import DataHandler, parse_grid
+
+    grid = parse_grid(args.params)
+    candidates = SAMPLERS[args.optimize](grid, args.samples, args.seed)
+    arrays = DataHandler(compact=args.compact).load_or_fetch_arrays()
+
+    # Workers never plot or profile, only the metrics are sent back
+    args.plot = args.save_plot = args.profile = False
+
+    print(
+        "Optimizing %s over %d of %d combinations (%s sampler, %s objective)..."
+        % (
+            args.strategy_name,
+            len(candidates),
+            len(expand_grid(grid)),
+            args.optimize,
+            args.objective,
+        )
+    )
+    optimizer = Optimizer(
+        args, args.strategy_name, arrays, OBJECTIVES[args.objective], args.workers
+    )
+    try:
+        if args.optimize == "halving":
+            rows = optimizer.successive_halving(candidates, args.keep, args.min_bars)
+        else:
+            rows = optimizer.evaluate(candidates)
+    finally:
+        optimizer.close()
+
+    print_ranking(rows, args.objective)
+    print(
+        "\n%d Cerebro runs, %.1f full-range equivalents"
+        % (optimizer.runs, optimizer.bar_runs / optimizer.bars)
+    )
+    return rows
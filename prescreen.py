@@ -0,0 +1,181 @@
+"""Vectorized pre-screening engine for the crossover strategies.
+
+Reproduces the entry and exit rules of ``MaCross`` and
+``TripleEMaStrategy`` on whole price arrays, with the order handling of
+backtrader's default broker: market orders fill at the next bar's open,
+``PercentSizer(percents=100)`` sizes them from the signal bar's close and
+orders the cash cannot cover are rejected. A run takes milliseconds, so
+large grids can be screened here and only the best candidates re-run
+through ``BacktestRunner``.
+
+Indicators come from an ``IndicatorCache`` over the whole history, so a
+run restricted to a window of bars (``begin``/``end``) still starts with
+warmed up indicators and costs no indicator work once the cache is filled.
+"""
+
+import numpy as np
+
+from fastind import IndicatorCache, crossover, first_valid
+
+TRADE_DTYPE = np.dtype(
+    [
+        ("entry_bar", np.int64),
+        ("exit_bar", np.int64),
+        ("entry_price", np.float64),
+        ("exit_price", np.float64),
+        ("size", np.float64),
+        ("pnl", np.float64),
+    ]
+)
+
+
+class PrescreenResult:
+    """Equity curve (broker value per bar) and trades of a vectorized run.
+
+    Trades still open at the end have ``exit_bar == -1`` and a NaN exit
+    price and pnl, like the open trades backtrader leaves behind.
+    """
+
+    def __init__(self, equity, trades, cash):
+        self.equity = equity
+        self.trades = trades
+        self.cash = cash
+
+    @property
+    def final_value(self):
+        return float(self.equity[-1]) if len(self.equity) else self.cash
+
+    @property
+    def closed_trades(self):
+        return self.trades[self.trades["exit_bar"] >= 0]
+
+    @property
+    def total_return(self):
+        """Log return, as reported by bt.analyzers.Returns"""
+        return float(np.log(self.final_value / self.cash))
+
+    @property
+    def winrate(self):
+        closed = self.closed_trades
+        return float(np.mean(closed["pnl"] >= 0.0)) if len(closed) else 0.0
+
+
+def simulate_long(open_, close, entries, exits, start, cash=1000.0, end=None):
+    """Run all-in long trades on boolean entry/exit signal arrays.
+
+    Signals are evaluated on bar close from ``start`` (the first bar the
+    strategy's next() sees) up to ``end``. A flat strategy buys on an entry
+    signal, a long one closes on an exit signal, both at the next open.
+    """
+    n = len(close) if end is None else end
+    entry_bars = np.flatnonzero(entries[:n])
+    exit_bars = np.flatnonzero(exits[:n])
+
+    trades = []
+    change_bars, change_cash, change_size = [0], [cash], [0.0]
+    bar = start
+    while True:
+        i = np.searchsorted(entry_bars, bar)
+        if i == len(entry_bars) or entry_bars[i] + 1 >= n:
+            break
+        signal = entry_bars[i]
+        fill = signal + 1
+        size = cash / close[signal]
+
+        # Submission check at the signal close, then the real fill at open
+        if cash - size * close[signal] < 0.0 or cash - size * open_[fill] < 0.0:
+            bar = fill
+            continue
+
+        entry_price = open_[fill]
+        cash -= size * entry_price
+        change_bars.append(fill)
+        change_cash.append(cash)
+        change_size.append(size)
+
+        j = np.searchsorted(exit_bars, fill)
+        if j == len(exit_bars) or exit_bars[j] + 1 >= n:
+            trades.append((fill, -1, entry_price, np.nan, size, np.nan))
+            break
+
+        out = exit_bars[j] + 1
+        exit_price = open_[out]
+        pnl = size * (exit_price - entry_price)
+        cash += size * entry_price + pnl
+        change_bars.append(out)
+        change_cash.append(cash)
+        change_size.append(0.0)
+        trades.append((fill, out, entry_price, exit_price, size, pnl))
+        bar = out
+
+    # Cash and position are piecewise constant between fills
+    segment = np.searchsorted(change_bars, np.arange(n), "right") - 1
+    cash_curve = np.asarray(change_cash)[segment]
+    size_curve = np.asarray(change_size)[segment]
+    equity = cash_curve + size_curve * np.asarray(close[:n])
+    return PrescreenResult(equity, np.array(trades, dtype=TRADE_DTYPE), change_cash[0])
+
+
+def _closes(arrays):
+    return (
+        np.asarray(arrays["open"], dtype=np.float64),
+        np.asarray(arrays["close"], dtype=np.float64),
+    )
+
+
+def run_macross(
+    arrays,
+    fast_length=50,
+    slow_length=200,
+    cash=1000.0,
+    cache=None,
+    begin=0,
+    end=None,
+):
+    """Vectorized MaCross, trading the bars in [begin, end) only"""
+    cache = cache or IndicatorCache(arrays)
+    open_, close = _closes(arrays)
+    ma_fast = cache.get("sma", "close", fast_length)
+    ma_slow = cache.get("sma", "close", slow_length)
+    ema_1k = cache.get("ema", "close", 1000)
+    cross = crossover(ma_fast, ma_slow)
+    # Built by the strategy but unused, it still delays the first next()
+    cross_slow_1k = crossover(ma_slow, ema_1k)
+
+    start = max(first_valid(cross), first_valid(cross_slow_1k), begin)
+    entries = (cross > 0) & (close > ema_1k)
+    exits = cross < 0
+    return simulate_long(open_, close, entries, exits, start, cash, end)
+
+
+def run_triple_ema(
+    arrays,
+    fast_length=50,
+    mid_length=200,
+    slow_length=500,
+    cash=1000.0,
+    cache=None,
+    begin=0,
+    end=None,
+):
+    """Vectorized TripleEMaStrategy, trading the bars in [begin, end) only"""
+    cache = cache or IndicatorCache(arrays)
+    open_, close = _closes(arrays)
+    ma_fast = cache.get("sma", "close", fast_length)
+    ma_mid = cache.get("sma", "close", mid_length)
+    ma_slow = cache.get("sma", "close", slow_length)
+    hma_1k = cache.get("hma", "close", 1000)
+    ema_1k = cache.get("ema", "close", 1000)
+    cross = crossover(ma_fast, ma_slow)
+    cross_mid = crossover(ma_fast, ma_mid)
+
+    start = max(first_valid(line) for line in (hma_1k, ema_1k, cross, cross_mid))
+    entries = (cross > 0) & (close > ema_1k)
+    exits = (cross_mid < 0) | (close < hma_1k)
+    return simulate_long(open_, close, entries, exits, max(start, begin), cash, end)
+
+
+ENGINES = {
+    "MaCross": run_macross,
+    "TripleEMaStrategy": run_triple_ema,
+}
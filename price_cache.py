@@ -0,0 +1,323 @@
+"""Columnar price cache partitioned by symbol, interval and month"""
+
+import datetime as dt
+import os
+
+import numpy as np
+
+COLUMNS = ("datetime", "open", "high", "low", "close", "volume")
+DTYPES = {
+    "datetime": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+}
+# Columns a compact cache may store as float32
+VALUE_COLUMNS = COLUMNS[1:]
+# Most decimal places a compact column is checked for, Binance quotes up to 8
+MAX_DECIMALS = 8
+
+# Bar lengths of the fixed size Binance kline intervals
+INTERVAL_MILLIS = {
+    "1s": 1000,
+    "1m": 60_000,
+    "3m": 3 * 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "30m": 30 * 60_000,
+    "1h": 3_600_000,
+    "2h": 2 * 3_600_000,
+    "4h": 4 * 3_600_000,
+    "6h": 6 * 3_600_000,
+    "8h": 8 * 3_600_000,
+    "12h": 12 * 3_600_000,
+    "1d": 86_400_000,
+    "3d": 3 * 86_400_000,
+    "1w": 7 * 86_400_000,
+}
+
+
+def interval_millis(interval):
+    """Length of one bar of interval in milliseconds"""
+    try:
+        return INTERVAL_MILLIS[interval]
+    except KeyError:
+        raise ValueError(f"Unsupported interval: {interval}") from None
+
+
+def empty_arrays():
+    return {column: np.empty(0, dtype=DTYPES[column]) for column in COLUMNS}
+
+
+def compact_decimals(values):
+    """Decimal places that restore float64 values from their float32 copy.
+
+    Returns the fewest decimal places d with which every value is a decimal
+    and rounding its float32 copy to d places gives the value back exactly,
+    or None if there are none. Prices quoted in exchange ticks usually have
+    them, sums such as resampled volumes usually do not.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    for decimals in range(MAX_DECIMALS + 1):
+        if np.array_equal(np.round(values, decimals), values):
+            break
+    else:
+        return None
+    restored = np.round(values.astype(np.float32).astype(np.float64), decimals)
+    return decimals if np.array_equal(restored, values) else None
+
+
+def to_millis(value):
+    """Epoch milliseconds of a datetime, naive datetimes are taken as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt.timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def last_closed_bar(interval, now=None):
+    """Epoch ms open time of the last bar of interval that has closed by now"""
+    now = to_millis(now or dt.datetime.now(dt.timezone.utc))
+    step = interval_millis(interval)
+    return (now // step - 1) * step
+
+
+def subtract_ranges(ranges, removed):
+    """Parts of the inclusive (start, end) ranges that removed does not cover"""
+    for lo, hi in removed:
+        kept = []
+        for start, end in ranges:
+            if hi < start or lo > end:
+                kept.append((start, end))
+                continue
+            if start < lo:
+                kept.append((start, lo - 1))
+            if hi < end:
+                kept.append((hi + 1, end))
+        ranges = kept
+    return ranges
+
+
+def from_millis(millis):
+    """UTC datetime of an epoch millisecond timestamp"""
+    return dt.datetime.fromtimestamp(millis / 1000.0, dt.timezone.utc)
+
+
+def month_of(millis):
+    """YYYY-MM partition key of epoch millisecond timestamps"""
+    return np.datetime_as_string(
+        np.asarray(millis).astype("datetime64[ms]").astype("datetime64[M]")
+    )
+
+
+class PriceCache:
+    """Stores OHLCV bars as one .npy file per column and month.
+
+    Layout: ``<root>/<symbol>/<interval>/<YYYY-MM>/<column>.npy``, with
+    ``datetime`` holding the bar open time in epoch milliseconds. Files are
+    memory-mapped on read, so only the months and rows of the requested
+    range are ever touched.
+
+    A ``compact`` cache stores the price and volume columns of a month as
+    float32 where that is lossless, see ``compact_decimals``, with their
+    decimal places in ``decimals.npy``. That takes 28 instead of 48 bytes
+    per bar where all of them qualify. Reads restore the exact float64
+    values, so compact and plain caches return the same bars. Either kind
+    reads the months the other wrote and ``convert`` rewrites them.
+    """
+
+    def __init__(self, root="price_cache", compact=False):
+        self.root = root
+        self.compact = compact
+
+    def _series_dir(self, symbol, interval):
+        return os.path.join(self.root, symbol, interval)
+
+    def months(self, symbol, interval):
+        """Sorted partition keys present for a series"""
+        path = self._series_dir(symbol, interval)
+        if not os.path.isdir(path):
+            return []
+        return sorted(
+            name
+            for name in os.listdir(path)
+            if os.path.exists(os.path.join(path, name, "datetime.npy"))
+        )
+
+    def _load_month(self, symbol, interval, month, mmap_mode="r"):
+        """Columns of a month as stored, and its decimals (None if plain)"""
+        path = os.path.join(self._series_dir(symbol, interval), month)
+        arrays = {
+            column: np.load(os.path.join(path, column + ".npy"), mmap_mode=mmap_mode)
+            for column in COLUMNS
+        }
+        decimals = os.path.join(path, "decimals.npy")
+        if not os.path.exists(decimals):
+            return arrays, None
+        return arrays, dict(zip(VALUE_COLUMNS, np.load(decimals).tolist()))
+
+    @staticmethod
+    def _restore(arrays, decimals):
+        """float64 columns of stored ones, rounding float32 ones back"""
+        if decimals is None:
+            return arrays
+        return {
+            column: (
+                np.round(values.astype(np.float64), decimals[column])
+                if values.dtype == np.float32
+                else values
+            )
+            for column, values in arrays.items()
+        }
+
+    def iter_months(self, symbol, interval, start=None, end=None):
+        """Yield the bars with start <= datetime <= end one month at a time.
+
+        Every part is a dict of memory-mapped column slices, so walking a
+        long history only ever maps the month being read.
+        """
+        first = month_of(start) if start is not None else None
+        last = month_of(end) if end is not None else None
+
+        for month in self.months(symbol, interval):
+            if (first is not None and month < first) or (
+                last is not None and month > last
+            ):
+                continue
+            arrays, decimals = self._load_month(symbol, interval, month)
+            times = arrays["datetime"]
+            lo = 0 if start is None else np.searchsorted(times, start, "left")
+            hi = len(times) if end is None else np.searchsorted(times, end, "right")
+            if hi > lo:
+                part = {column: arrays[column][lo:hi] for column in COLUMNS}
+                yield self._restore(part, decimals)
+
+    def read(self, symbol, interval, start=None, end=None):
+        """Return the bars with start <= datetime <= end (epoch ms).
+
+        The result is a dict of column arrays. Months outside the range are
+        not opened.
+        """
+        parts = list(self.iter_months(symbol, interval, start, end))
+        if not parts:
+            return empty_arrays()
+        return {
+            column: np.concatenate([part[column] for part in parts])
+            for column in COLUMNS
+        }
+
+    def empty_ranges(self, symbol, interval):
+        """(start, end) ms ranges marked as having no bars, as an (n, 2) array"""
+        path = os.path.join(self._series_dir(symbol, interval), "empty_ranges.npy")
+        if not os.path.exists(path):
+            return np.empty((0, 2), dtype=np.int64)
+        return np.load(path)
+
+    def mark_empty(self, symbol, interval, ranges):
+        """Record (start, end) ms ranges the exchange has no bars for, e.g.
+        outages, so that missing_ranges stops reporting them"""
+        ranges = np.asarray(ranges, dtype=np.int64).reshape(-1, 2)
+        if not len(ranges):
+            return
+        path = self._series_dir(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        self._save(
+            os.path.join(path, "empty_ranges.npy"),
+            np.concatenate([self.empty_ranges(symbol, interval), ranges]),
+        )
+
+    def missing_ranges(self, symbol, interval, start, end):
+        """(start, end) ms ranges inside [start, end] that the cache lacks.
+
+        Covers a missing head and tail as well as holes between cached bars
+        that are wider than one bar, apart from the ranges marked empty.
+        """
+        empty = self.empty_ranges(symbol, interval).tolist()
+        return subtract_ranges(self._gaps(symbol, interval, start, end), empty)
+
+    def _gaps(self, symbol, interval, start, end):
+        step = interval_millis(interval)
+        times = self.read(symbol, interval, start, end)["datetime"]
+        if not len(times):
+            return [(start, end)]
+
+        ranges = []
+        if times[0] - start >= step:
+            ranges.append((start, int(times[0]) - 1))
+        for i in np.flatnonzero(np.diff(times) > step):
+            ranges.append((int(times[i]) + step, int(times[i + 1]) - 1))
+        if end - times[-1] >= step:
+            ranges.append((int(times[-1]) + step, end))
+        return ranges
+
+    def write(self, symbol, interval, arrays):
+        """Merge bars into the cache, newer values win on duplicate times"""
+        times = np.asarray(arrays["datetime"], dtype=np.int64)
+        if not len(times):
+            return
+        months = month_of(times)
+
+        for month in np.unique(months):
+            mask = months == month
+            new = {
+                column: np.asarray(arrays[column], dtype=DTYPES[column])[mask]
+                for column in COLUMNS
+            }
+            if month in self.months(symbol, interval):
+                old = self._restore(
+                    *self._load_month(symbol, interval, month, mmap_mode=None)
+                )
+                new = {
+                    column: np.concatenate([old[column], new[column]])
+                    for column in COLUMNS
+                }
+            self._write_month(symbol, interval, month, new)
+
+    def _write_month(self, symbol, interval, month, arrays):
+        # Keep the last occurrence of every timestamp, sorted by time
+        times = arrays["datetime"][::-1]
+        _, keep = np.unique(times, return_index=True)
+        keep = len(times) - 1 - keep
+
+        arrays = {column: arrays[column][keep] for column in COLUMNS}
+        decimals = None
+        if self.compact:
+            decimals = [compact_decimals(arrays[column]) for column in VALUE_COLUMNS]
+            for column, places in zip(VALUE_COLUMNS, decimals):
+                if places is not None:
+                    arrays[column] = arrays[column].astype(np.float32)
+
+        path = os.path.join(self._series_dir(symbol, interval), month)
+        os.makedirs(path, exist_ok=True)
+        # The decimals go first, so a month never has float32 columns without
+        # them. Plain months lose theirs last, once every column is float64
+        if decimals is not None:
+            self._save(
+                os.path.join(path, "decimals.npy"),
+                np.array([-1 if d is None else d for d in decimals], np.int8),
+            )
+        for column in COLUMNS:
+            self._save(os.path.join(path, column + ".npy"), arrays[column])
+        if decimals is None and os.path.exists(os.path.join(path, "decimals.npy")):
+            os.remove(os.path.join(path, "decimals.npy"))
+
+    @staticmethod
+    def _save(target, values):
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(values))
+        os.replace(tmp, target)
+
+    def convert(self, symbol, interval):
+        """Rewrite the months of a series stored the other way (compact or
+        plain) than this cache stores them, returns their number"""
+        converted = 0
+        for month in self.months(symbol, interval):
+            path = os.path.join(self._series_dir(symbol, interval), month)
+            if os.path.exists(os.path.join(path, "decimals.npy")) == self.compact:
+                continue
+            arrays = self._load_month(symbol, interval, month, mmap_mode=None)
+            self._write_month(symbol, interval, month, self._restore(*arrays))
+            converted += 1
+        return converted
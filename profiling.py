@@ -0,0 +1,200 @@
+"""Per-indicator and per-phase profiling of a Cerebro run.
+
+``Profiler.instrument(cerebro)`` wraps, for the duration of a run, the
+entry points backtrader calls on every bar: the ``next``/``once`` of every
+indicator and observer, the strategy's ``next`` and order methods and
+notifications, the broker, the data feeds and the analyzer hooks. Each
+call is timed on a stack, so the report tells the time spent inside a
+component itself from the time spent in what it calls. Line arithmetic
+(e.g. ``hl2 = (high + low) / 2``) counts towards the indicator that owns
+it, the engine's own bar loop and buffer bookkeeping towards ``cerebro``.
+"""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import backtrader as bt
+from backtrader.analyzer import TimeFrameAnalyzerBase
+from backtrader.lineiterator import LineIterator
+
+ROOT = "cerebro"
+
+STRATEGY_METHODS = (
+    "prenext",
+    "nextstart",
+    "next",
+    "notify_order",
+    "notify_trade",
+    "buy",
+    "sell",
+    "close",
+    "cancel",
+    "buy_bracket",
+    "sell_bracket",
+)
+
+ANALYZER_HOOKS = (
+    "_start",
+    "_prenext",
+    "_nextstart",
+    "_next",
+    "_notify_cashvalue",
+    "_notify_fund",
+    "_notify_order",
+    "_notify_trade",
+    "_stop",
+)
+
+
+def _indicator_label(obj, phase):
+    # Strategies and observers are timed through their own methods
+    if isinstance(obj, bt.Indicator):
+        return "%s.%s" % (type(obj).__name__, phase)
+    return None
+
+
+def _method_label(name):
+    return lambda obj: "%s.%s" % (type(obj).__name__, name.lstrip("_"))
+
+
+def _subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _subclasses(subclass)
+
+
+class Profiler:
+    """Call counts, inclusive and self time per call stack"""
+
+    def __init__(self):
+        # (label, ...) path -> [calls, total seconds, self seconds]
+        self.stats = defaultdict(lambda: [0, 0.0, 0.0])
+        self._stack = [[(ROOT,), 0.0]]
+        self._patches = []
+
+    def call(self, label, function, *args, **kwargs):
+        """Run function(*args, **kwargs), timed as a frame named label"""
+        frame = [self._stack[-1][0] + (label,), 0.0]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            self._stack[-1][1] += elapsed
+            stat = self.stats[frame[0]]
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] += elapsed - frame[1]
+
+    def _method(self, function, label_of):
+        profiler = self
+
+        def timed(obj, *args, **kwargs):
+            label = label_of(obj)
+            if label is None:
+                return function(obj, *args, **kwargs)
+            return profiler.call(label, function, obj, *args, **kwargs)
+
+        return timed
+
+    def _patch(self, owner, name, replacement):
+        self._patches.append((owner, name, owner.__dict__.get(name)))
+        setattr(owner, name, replacement)
+
+    def _patch_function(self, obj, name, label):
+        function = getattr(obj, name)
+        self._patch(obj, name, lambda *a, **kw: self.call(label, function, *a, **kw))
+
+    def _patch_method(self, cls, name, label_of):
+        self._patch(cls, name, self._method(getattr(cls, name), label_of))
+
+    @contextmanager
+    def instrument(self, cerebro):
+        """Time the components of cerebro while the block runs"""
+        for phase in ("next", "once"):
+            self._patch_method(
+                LineIterator,
+                "_" + phase,
+                lambda obj, phase=phase: _indicator_label(obj, phase),
+            )
+
+        # In runonce mode strategies call observer.next() directly
+        for cls in set(_subclasses(bt.Observer)):
+            if "next" in cls.__dict__:
+                self._patch_method(cls, "next", _method_label("next"))
+
+        stratclasses = {
+            stratcls for stratlist in cerebro.strats for stratcls, _, _ in stratlist
+        }
+        for stratcls in stratclasses:
+            for name in STRATEGY_METHODS:
+                self._patch_method(stratcls, name, _method_label(name))
+
+        for cls in (bt.Analyzer, TimeFrameAnalyzerBase):
+            for hook in ANALYZER_HOOKS:
+                if hook in cls.__dict__:
+                    self._patch_method(cls, hook, _method_label(hook))
+
+        self._patch_function(cerebro.broker, "next", "broker.next")
+        for data in cerebro.datas:
+            for name in ("preload", "next"):
+                self._patch_function(data, name, "data.%s" % name)
+
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            # Whatever the wrapped components do not cover is the engine's own
+            total = time.perf_counter() - start
+            root = self.stats[(ROOT,)]
+            root[0] += 1
+            root[1] += total
+            root[2] += total - self._stack[0][1]
+            self._stack[0][1] = 0.0
+
+            while self._patches:
+                owner, name, original = self._patches.pop()
+                if original is None:
+                    delattr(owner, name)
+                else:
+                    setattr(owner, name, original)
+
+    def ranked(self):
+        """(label, calls, total, self) per label, most self time first.
+
+        Totals of a label called from within itself are counted once per
+        level, which only matters for recursive components.
+        """
+        labels = defaultdict(lambda: [0, 0.0, 0.0])
+        for path, (calls, total, own) in self.stats.items():
+            stat = labels[path[-1]]
+            stat[0] += calls
+            stat[1] += total
+            stat[2] += own
+        rows = [(label, *stat) for label, stat in labels.items()]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def print_report(self, limit=25):
+        rows = self.ranked()
+        measured = sum(row[3] for row in rows) or 1.0
+        print("\n--- Profile (hot paths by self time) ---")
+        print(
+            "%-36s %10s %10s %7s %10s %10s"
+            % ("component", "self s", "total s", "self %", "calls", "us/call")
+        )
+        for label, calls, total, own in rows[:limit]:
+            print(
+                "%-36s %10.3f %10.3f %6.1f%% %10d %10.2f"
+                % (label, own, total, own / measured * 100, calls, total / calls * 1e6)
+            )
+
+    def write_folded(self, path):
+        """Write folded stacks (microseconds of self time) for flamegraph.pl"""
+        with open(path, "w") as f:
+            for stack, (_, _, own) in sorted(self.stats.items()):
+                micros = int(round(own * 1e6))
+                if micros > 0:
+                    f.write("%s %d\n" % (";".join(stack), micros))
@@ -0,0 +1,73 @@
+"""Analyzers that record a run for storing and later analysis"""
+
+import backtrader as bt
+import numpy as np
+
+from feeds import EPOCH_DATENUM, MILLIS_PER_DAY
+from metrics import RunningCurve
+
+TRADE_DTYPE = np.dtype(
+    [("pnl", np.float64), ("pnlcomm", np.float64), ("bars", np.int64)]
+)
+
+
+def datenum_to_millis(datenums):
+    """Inverse of feeds.millis_to_datenum, rounded to whole milliseconds"""
+    days = np.asarray(datenums, dtype=np.float64) - EPOCH_DATENUM
+    return np.rint(days * MILLIS_PER_DAY).astype(np.int64)
+
+
+class EquityRecorder(bt.Analyzer):
+    """Broker value at the close of every bar and the closed trades.
+
+    This is all ``metrics.compute_metrics`` needs, so it replaces the
+    per-bar work of the SharpeRatio, DrawDown, Returns and TradeAnalyzer
+    analyzers. The value arrays are allocated for every bar of a preloaded
+    feed up front and doubled when a streamed feed outgrows them.
+    ``get_analysis`` returns the ``datetime`` (epoch ms) and ``value``
+    arrays, the ``start_value`` and the ``trades`` as a TRADE_DTYPE array.
+
+    Under ``exactbars`` the curve is not kept: every bar is folded into a
+    ``metrics.RunningCurve``, returned as ``curve`` next to empty arrays.
+    """
+
+    # Unset in checkpoints pickled before the curve could be folded
+    _curve = None
+
+    def start(self):
+        self._trades = []
+        self.start_value = self.strategy.broker.getvalue()
+        if self.strategy.env.p.exactbars:
+            self._curve = RunningCurve(self.start_value)
+            size = 0
+        else:
+            size = max(self.data.buflen(), 1)
+        self._datenums = np.empty(size)
+        self._values = np.empty(size)
+        self._len = 0
+
+    def next(self):
+        if self._curve is not None:
+            millis = int(datenum_to_millis(self.data.datetime[0]))
+            self._curve.add(millis, self.strategy.broker.getvalue())
+            return
+        i = self._len
+        if i == len(self._values):
+            self._datenums = np.resize(self._datenums, 2 * i)
+            self._values = np.resize(self._values, 2 * i)
+        self._datenums[i] = self.data.datetime[0]
+        self._values[i] = self.strategy.broker.getvalue()
+        self._len = i + 1
+
+    def notify_trade(self, trade):
+        if trade.isclosed:
+            self._trades.append((trade.pnl, trade.pnlcomm, trade.barlen))
+
+    def get_analysis(self):
+        return {
+            "datetime": datenum_to_millis(self._datenums[: self._len]),
+            "value": self._values[: self._len].copy(),
+            "start_value": self.start_value,
+            "trades": np.array(self._trades, dtype=TRADE_DTYPE),
+            "curve": self._curve,
+        }
@@ -0,0 +1,296 @@
+"""SQLite store of finished backtests, keyed by what determines their result.
+
+A run key is the SHA-256 of the strategy's module source and resolved
+parameters, the sources of the modules that feed, record and measure the
+run, the broker, sizer and analyzer settings, the backtrader version and a
+fingerprint of the price data. Running the same key again returns the
+stored metrics and equity curve instead of running Cerebro:
+
+    store = ResultStore()
+    metrics = store.get(key)
+    store.query(strategy="MaCross", order_by="sharpe", limit=10)
+"""
+
+import datetime as dt
+import hashlib
+import importlib
+import inspect
+import json
+import sqlite3
+import sys
+import zlib
+
+import backtrader as bt
+import numpy as np
+
+from price_cache import COLUMNS
+
+# Modules besides the strategy's whose code changes the numbers of a run
+RESULT_MODULES = ("feeds", "fastind", "metrics", "recorder", "resample")
+
+# Metrics that get their own column, so they can be filtered and ordered on
+METRIC_COLUMNS = (
+    "final_value",
+    "trades",
+    "winrate",
+    "sharpe",
+    "max_drawdown",
+    "total_return",
+)
+
+RUN_COLUMNS = (
+    "key",
+    "strategy",
+    "params",
+    "symbol",
+    "interval",
+    "start",
+    "end",
+    "bars",
+    "created",
+) + METRIC_COLUMNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    key TEXT PRIMARY KEY,
+    strategy TEXT NOT NULL,
+    params TEXT NOT NULL,
+    symbol TEXT,
+    interval TEXT,
+    start INTEGER,
+    end INTEGER,
+    bars INTEGER,
+    created TEXT NOT NULL,
+    final_value REAL,
+    trades INTEGER,
+    winrate REAL,
+    sharpe REAL,
+    max_drawdown REAL,
+    total_return REAL,
+    metrics TEXT NOT NULL,
+    equity_datetime BLOB,
+    equity_value BLOB
+);
+CREATE INDEX IF NOT EXISTS runs_strategy ON runs (strategy, symbol, interval);
+"""
+
+
+def data_fingerprint(chunks):
+    """Hash of the price data, given as an iterable of column array dicts.
+
+    Every column is hashed on its own, so the same bars give the same
+    fingerprint whether they come as one dict or month by month. Returns
+    (fingerprint, bars, first datetime, last datetime).
+    """
+    hashes = {column: hashlib.sha256() for column in COLUMNS}
+    bars, first, last = 0, None, None
+    for chunk in chunks:
+        times = chunk["datetime"]
+        if not len(times):
+            continue
+        for column in COLUMNS:
+            dtype = np.int64 if column == "datetime" else np.float64
+            hashes[column].update(np.ascontiguousarray(chunk[column], dtype=dtype))
+        bars += len(times)
+        first = int(times[0]) if first is None else first
+        last = int(times[-1])
+
+    digest = hashlib.sha256()
+    for column in COLUMNS:
+        digest.update(hashes[column].digest())
+    return digest.hexdigest(), bars, first, last
+
+
+def strategy_params(strategy_cls, params):
+    """All parameters of strategy_cls, defaults filled in"""
+    resolved = dict(strategy_cls.params._getitems())
+    resolved.update(params)
+    return resolved
+
+
+def cerebro_settings(cerebro):
+    """Broker, commission, sizer and analyzer settings of a set up cerebro"""
+    broker = cerebro.broker
+    sizer = cerebro.sizers.get(None)
+    settings = {
+        "cash": broker.startingcash,
+        "broker": {
+            name: value
+            for name, value in broker.params._getkwargs().items()
+            if name not in ("cash", "commission")
+        },
+        "commission": {
+            str(name): dict(comminfo.params._getkwargs())
+            for name, comminfo in broker.comminfo.items()
+        },
+        "sizer": sizer and [sizer[0].__name__, list(sizer[1]), sizer[2]],
+        "analyzers": sorted(
+            [cls.__module__ + "." + cls.__name__, kwargs]
+            for cls, _, kwargs in cerebro.analyzers
+        ),
+    }
+    # Extra feeds, e.g. resampled timeframes, are part of what a strategy sees
+    if len(cerebro.datas) > 1:
+        settings["datas"] = [data._name for data in cerebro.datas]
+    return settings
+
+
+def source_hash(module):
+    """SHA-256 of a module's source"""
+    return hashlib.sha256(inspect.getsource(module).encode()).hexdigest()
+
+
+def run_key(strategy_cls, params, settings, fingerprint):
+    """Content hash of everything that determines a backtest's result"""
+    description = {
+        "strategy": strategy_cls.__name__,
+        "source": source_hash(sys.modules[strategy_cls.__module__]),
+        "modules": {
+            name: source_hash(importlib.import_module(name)) for name in RESULT_MODULES
+        },
+        "params": strategy_params(strategy_cls, params),
+        "settings": settings,
+        "data": fingerprint,
+        "backtrader": bt.__version__,
+    }
+    text = json.dumps(description, sort_keys=True, default=repr)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultStore:
+    """Metrics and equity curves of finished runs in one SQLite file"""
+
+    def __init__(self, path="results.sqlite"):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def get(self, key):
+        """Stored metrics of a run, None if it never ran"""
+        row = self.db.execute("SELECT metrics FROM runs WHERE key = ?", (key,))
+        row = row.fetchone()
+        return None if row is None else json.loads(row["metrics"])
+
+    def equity(self, key):
+        """Stored (datetime, value) arrays of a run's equity curve"""
+        row = self.db.execute(
+            "SELECT equity_datetime, equity_value FROM runs WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row["equity_value"] is None:
+            return None
+        return (
+            np.frombuffer(zlib.decompress(row["equity_datetime"]), dtype=np.int64),
+            np.frombuffer(zlib.decompress(row["equity_value"]), dtype=np.float64),
+        )
+
+    def put(self, key, info, metrics, equity=None):
+        """Store a finished run.
+
+        info holds the strategy name, params, symbol, interval, start, end
+        and bars of the run, equity the recorder's datetime and value arrays.
+        """
+        blobs = (None, None)
+        if equity is not None:
+            blobs = (
+                zlib.compress(np.asarray(equity["datetime"], np.int64).tobytes()),
+                zlib.compress(np.asarray(equity["value"], np.float64).tobytes()),
+            )
+        values = dict(info, key=key, params=json.dumps(info["params"], sort_keys=True))
+        values["created"] = dt.datetime.now(dt.timezone.utc).isoformat(
+            timespec="seconds"
+        )
+        values.update((name, metrics.get(name)) for name in METRIC_COLUMNS)
+        columns = RUN_COLUMNS + ("metrics", "equity_datetime", "equity_value")
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO runs (%s) VALUES (%s)"
+                % (", ".join(columns), ", ".join("?" * len(columns))),
+                [values.get(name) for name in RUN_COLUMNS]
+                + [json.dumps(metrics)]
+                + list(blobs),
+            )
+
+    def query(
+        self,
+        strategy=None,
+        symbol=None,
+        interval=None,
+        order_by="total_return",
+        limit=None,
+    ):
+        """Stored runs as dicts, best order_by metric first"""
+        if order_by not in METRIC_COLUMNS + ("created", "bars"):
+            raise ValueError(f"Cannot order runs by {order_by}")
+        where, args = [], []
+        for name, value in (
+            ("strategy", strategy),
+            ("symbol", symbol),
+            ("interval", interval),
+        ):
+            if value is not None:
+                where.append("%s = ?" % name)
+                args.append(value)
+        sql = "SELECT %s FROM runs" % ", ".join(RUN_COLUMNS)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY %s IS NULL, %s DESC" % (order_by, order_by)
+        if limit is not None:
+            sql += " LIMIT %d" % limit
+        return [self._run(row) for row in self.db.execute(sql, args)]
+
+    def compare(self, keys):
+        """Stored runs of the given keys (or unique key prefixes), in order"""
+        runs = []
+        for key in keys:
+            rows = self.db.execute(
+                "SELECT %s FROM runs WHERE key LIKE ?" % ", ".join(RUN_COLUMNS),
+                (key + "%",),
+            ).fetchall()
+            if len(rows) != 1:
+                raise KeyError(f"{len(rows)} stored runs match key {key}")
+            runs.append(self._run(rows[0]))
+        return runs
+
+    @staticmethod
+    def _run(row):
+        run = dict(row)
+        run["params"] = json.loads(run["params"])
+        return run
+
+
+def print_runs(runs):
+    """Print stored runs as a table"""
+    print(
+        "%-12s %-18s %-10s %-5s %9s %9s %9s %8s  %s"
+        % (
+            "key",
+            "strategy",
+            "symbol",
+            "int.",
+            "return",
+            "drawdown",
+            "winrate",
+            "sharpe",
+            "params",
+        )
+    )
+    for run in runs:
+        sharpe = run["sharpe"]
+        print(
+            "%-12s %-18s %-10s %-5s %9s %9s %9s %8s  %s"
+            % (
+                run["key"][:12],
+                run["strategy"],
+                run["symbol"] or "-",
+                run["interval"] or "-",
+                "%.2f%%" % (run["total_return"] * 100),
+                "%.2f%%" % run["max_drawdown"],
+                "%.2f%%" % (run["winrate"] * 100),
+                "-" if sharpe is None else "%.3f" % sharpe,
+                " ".join(f"{k}={v}" for k, v in run["params"].items()),
+            )
+        )
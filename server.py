@@ -0,0 +1,178 @@
+"""Local backtest service that keeps imports and price data warm.
+
+``python main.py --serve 127.0.0.1:8765`` imports backtrader and the
+strategies once and keeps every price series it has loaded in memory.
+Jobs are JSON objects POSTed to ``/backtest``:
+
+    {"strategy": "MaCross", "params": ["fast_length=20"],
+     "symbol": "BTCUSDT", "interval": "1h",
+     "start": "2020-01-01", "end": "2021-01-01"}
+
+Only ``strategy`` is required, ``params`` take the ``--param`` syntax and
+``timeframes`` and ``rerun`` work like the command line options. The
+answer holds the run key, the metrics and the report a command line run
+would print. ``client.py`` is a thin command line client for it. Jobs run
+one at a time and go through the result store like command line runs.
+"""
+
+import argparse
+import contextlib
+import datetime as dt
+import io
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+
+from main import BacktestRunner, DataHandler, parse_params
+from price_cache import to_millis
+from result_store import ResultStore, data_fingerprint
+
+
+class BacktestService:
+    """Runs backtest jobs on price series kept in memory between jobs"""
+
+    def __init__(self, args):
+        # Jobs never plot or profile, the run itself stays in the service
+        self.args = argparse.Namespace(
+            **dict(vars(args), plot=False, save_plot=False, profile=False)
+        )
+        self.series = {}
+        self.store = ResultStore(args.results) if args.results else None
+        self.started = time.time()
+        self.jobs = 0
+
+    def load(self, symbol, interval):
+        """Column arrays of a whole cached series, fetched and read once"""
+        if (symbol, interval) not in self.series:
+            handler = DataHandler(
+                symbol=symbol, interval=interval, compact=self.args.compact
+            )
+            try:
+                handler.fetch_missing()
+            except Exception as e:
+                print("Could not fetch %s %s: %s" % (symbol, interval, e))
+            self.series[symbol, interval] = handler.cache.read(symbol, interval)
+        return self.series[symbol, interval]
+
+    def status(self):
+        return {
+            "uptime": time.time() - self.started,
+            "jobs": self.jobs,
+            "series": [
+                {"symbol": symbol, "interval": interval, "bars": len(a["datetime"])}
+                for (symbol, interval), a in self.series.items()
+            ],
+        }
+
+    def run(self, job):
+        """Run (or look up) the backtest of a job dict, returns the answer"""
+        started = time.perf_counter()
+        symbol = job.get("symbol", "BTCUSDT")
+        interval = job.get("interval", "1h")
+        arrays = self.load(symbol, interval)
+
+        times = arrays["datetime"]
+        lo, hi = 0, len(times)
+        if job.get("start"):
+            start = to_millis(dt.datetime.fromisoformat(job["start"]))
+            lo = np.searchsorted(times, start, "left")
+        if job.get("end"):
+            end = to_millis(dt.datetime.fromisoformat(job["end"]))
+            hi = np.searchsorted(times, end, "right")
+        arrays = {column: values[lo:hi] for column, values in arrays.items()}
+        if not len(arrays["datetime"]):
+            raise ValueError(
+                "No %s %s bars in the requested range" % (symbol, interval)
+            )
+
+        args = argparse.Namespace(
+            **dict(vars(self.args), timeframes=job.get("timeframes", []))
+        )
+        runner = BacktestRunner(
+            args, job["strategy"], parse_params(job.get("params", []))
+        )
+        runner.data_handler = DataHandler(
+            symbol=symbol, interval=interval, compact=args.compact
+        )
+        runner.setup_cerebro(arrays)
+        data_info = data_fingerprint([arrays])
+        key = runner.run_key(data_info[0])
+
+        metrics = None
+        if self.store is not None and not job.get("rerun"):
+            metrics = self.store.get(key)
+        stored = metrics is not None
+        if not stored:
+            # The strategies' order logs stay out of the answer
+            with open(os.devnull, "w") as devnull:
+                with contextlib.redirect_stdout(devnull):
+                    results = runner.run_backtest()
+            metrics = runner.get_metrics(results)
+            if self.store is not None:
+                self.store.put(
+                    key, runner.run_info(data_info), metrics, runner.get_equity(results)
+                )
+
+        report = io.StringIO()
+        with contextlib.redirect_stdout(report):
+            runner.analyze_results(metrics)
+        self.jobs += 1
+        return {
+            "key": key,
+            "stored": stored,
+            "bars": data_info[1],
+            "seconds": time.perf_counter() - started,
+            "metrics": metrics,
+            "report": report.getvalue(),
+        }
+
+
+class BacktestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/status":
+            return self.reply(404, {"error": "Unknown path %s" % self.path})
+        self.reply(200, self.server.service.status())
+
+    def do_POST(self):
+        if self.path != "/backtest":
+            return self.reply(404, {"error": "Unknown path %s" % self.path})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            answer = self.server.service.run(json.loads(self.rfile.read(length)))
+        except (KeyError, TypeError, ValueError) as e:
+            return self.reply(400, {"error": "%s: %s" % (type(e).__name__, e)})
+        except Exception as e:
+            return self.reply(500, {"error": "%s: %s" % (type(e).__name__, e)})
+        self.reply(200, answer)
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        print("%s %s" % (self.address_string(), format % args))
+
+
+def run_server(args):
+    host, _, port = args.serve.rpartition(":")
+    service = BacktestService(args)
+    # Load the default series up front, so the first job is fast as well
+    service.load("BTCUSDT", "1h")
+    server = HTTPServer((host or "127.0.0.1", int(port)), BacktestHandler)
+    server.service = service
+    print("Serving backtests on http://%s:%s" % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if service.store is not None:
+            service.store.close()
@@ -1,6 +1,4 @@
 import backtrader as bt
-import backtrader.analyzers as btanalyzers
-import pandas as pd
 import datetime as dt
 from backtrader.indicators import (
     Indicator,
@@ -9,6 +7,73 @@ from backtrader.indicators import (
     Highest,
     Lowest,
 )
+from backtrader.metabase import findowner
+
+
+def shared_indicator(indcls, data, **params):
+    """Return indcls(data, **params), building it once per Cerebro run.
+
+    Identical (indicator type, params, input line) requests made anywhere in
+    the indicator graphs of the strategies of one run get the same instance,
+    so its lines are computed and buffered only once. Must be called from
+    the __init__ of a strategy or indicator.
+    """
+    requester = findowner(None, bt.LineIterator)
+    strategy = requester
+    while not isinstance(strategy, bt.Strategy):
+        strategy = strategy._owner
+
+    # runningstrats is a new list for every run, use it to scope the cache
+    cerebro = strategy.env
+    run, cache = getattr(cerebro, "_shared_indicators", (None, None))
+    if run is not cerebro.runningstrats:
+        cache = {}
+        cerebro._shared_indicators = (cerebro.runningstrats, cache)
+
+    key = (indcls, tuple(sorted(params.items())), id(data))
+    if key in cache:
+        indicator = cache[key][0]
+        if indicator._owner is requester:
+            return indicator
+        if not isinstance(requester, bt.Strategy):
+            requester.updateminperiod(indicator._minperiod)
+            return indicator
+        if isinstance(requester, SharedIndicatorStrategy):
+            requester._shared_indicators += (indicator,)
+            return indicator
+        # A plain strategy would ignore the warm-up of a foreign indicator
+        return indcls(data, **params)
+
+    indicator = indcls(data, **params)
+    # Keep data referenced so its id cannot be reused within the run
+    cache[key] = (indicator, data)
+    return indicator
+
+
+class SharedIndicatorStrategy(bt.Strategy):
+    """Strategy that waits for the warm-up of shared indicators it does not own"""
+
+    _shared_indicators = ()
+
+    def _start(self):
+        # A MultiBroker gives every strategy of the run its own broker
+        broker_for = getattr(self.broker, "broker_for", None)
+        if broker_for is not None:
+            self.broker = broker_for(self)
+            self._sizer.set(self, self.broker)
+        super()._start()
+
+    def _periodset(self):
+        super()._periodset()
+        dataids = [id(data) for data in self.datas]
+        for indicator in self._shared_indicators:
+            clock = indicator._clock
+            while id(clock) not in dataids and getattr(clock, "_clock", None):
+                clock = clock._clock
+            if id(clock) in dataids:
+                i = dataids.index(id(clock))
+                self._minperiods[i] = max(self._minperiods[i], indicator._minperiod)
+            self._minperiod = max(self._minperiod, indicator._minperiod)
 
 
 class SuperTrendBand(bt.Indicator):
@@ -20,13 +85,20 @@ class SuperTrendBand(bt.Indicator):
     lines = ("basic_ub", "basic_lb", "final_ub", "final_lb")
 
     def __init__(self):
-        self.atr = bt.indicators.AverageTrueRange(period=self.p.period)
-        self.l.basic_ub = ((self.data.high + self.data.low) / 2) + (
-            self.atr * self.p.multiplier
-        )
-        self.l.basic_lb = ((self.data.high + self.data.low) / 2) - (
-            self.atr * self.p.multiplier
+        # AverageTrueRange, with the true range shared between bands
+        self.atr = bt.indicators.SmoothedMovingAverage(
+            shared_indicator(bt.indicators.TrueRange, self.data),
+            period=self.p.period,
         )
+        hl2 = (self.data.high + self.data.low) / 2
+        self.l.basic_ub = hl2 + (self.atr * self.p.multiplier)
+        self.l.basic_lb = hl2 - (self.atr * self.p.multiplier)
+
+    def qbuffer(self, savemem=0):
+        super().qbuffer(savemem=savemem)
+        # next reads the previous final bands, keep them in a reduced buffer
+        self.l.final_ub.minbuffer(2)
+        self.l.final_lb.minbuffer(2)
 
     def next(self):
         if len(self) - 1 == self.p.period:
@@ -51,6 +123,30 @@ class SuperTrendBand(bt.Indicator):
             else:
                 self.l.final_lb[0] = self.l.final_lb[-1]
 
+    def once(self, start, end):
+        # Same recursion as next, run over the raw buffers in one pass
+        basic_ub = self.l.basic_ub.array
+        basic_lb = self.l.basic_lb.array
+        final_ub = self.l.final_ub.array
+        final_lb = self.l.final_lb.array
+        close = self.data.close.array
+
+        for i in range(start, end):
+            if i == self.p.period:
+                final_ub[i] = basic_ub[i]
+                final_lb[i] = basic_lb[i]
+                continue
+
+            if basic_ub[i] < final_ub[i - 1] or close[i - 1] > final_ub[i - 1]:
+                final_ub[i] = basic_ub[i]
+            else:
+                final_ub[i] = final_ub[i - 1]
+
+            if basic_lb[i] > final_lb[i - 1] or close[i - 1] < final_lb[i - 1]:
+                final_lb[i] = basic_lb[i]
+            else:
+                final_lb[i] = final_lb[i - 1]
+
 
 class SuperTrend(bt.Indicator):
     """
@@ -64,6 +160,11 @@ class SuperTrend(bt.Indicator):
     def __init__(self):
         self.stb = SuperTrendBand(period=self.p.period, multiplier=self.p.multiplier)
 
+    def qbuffer(self, savemem=0):
+        super().qbuffer(savemem=savemem)
+        # next reads the previous super trend, keep it in a reduced buffer
+        self.l.super_trend.minbuffer(2)
+
     def next(self):
         if len(self) - 1 == self.p.period:
             self.l.super_trend[0] = self.stb.final_ub[0]
@@ -81,6 +182,30 @@ class SuperTrend(bt.Indicator):
             else:
                 self.l.super_trend[0] = self.stb.final_ub[0]
 
+    def once(self, start, end):
+        # Same state machine as next, run over the raw buffers in one pass
+        super_trend = self.l.super_trend.array
+        final_ub = self.stb.final_ub.array
+        final_lb = self.stb.final_lb.array
+        close = self.data.close.array
+
+        for i in range(start, end):
+            if i == self.p.period:
+                super_trend[i] = final_ub[i]
+                continue
+
+            if super_trend[i - 1] == final_ub[i - 1]:
+                if close[i] <= final_ub[i]:
+                    super_trend[i] = final_ub[i]
+                else:
+                    super_trend[i] = final_lb[i]
+
+            if super_trend[i - 1] == final_lb[i - 1]:
+                if close[i] >= final_lb[i]:
+                    super_trend[i] = final_lb[i]
+                else:
+                    super_trend[i] = final_ub[i]
+
 
 class StochasticRSI(Indicator):
     """
@@ -127,13 +252,10 @@ class StochasticRSI(Indicator):
         self.plotinfo.plotyhlines = [self.p.upperband, self.p.lowerband]
 
     def __init__(self):
-        rsi_hh = Highest(
-            self.p.rsi(period=self.p.rsi_period), period=self.p.stoch_period
-        )
-        rsi_ll = Lowest(
-            self.p.rsi(period=self.p.rsi_period), period=self.p.stoch_period
-        )
-        knum = self.p.rsi(period=self.p.rsi_period) - rsi_ll
+        rsi = shared_indicator(self.p.rsi, self.data, period=self.p.rsi_period)
+        rsi_hh = shared_indicator(Highest, rsi, period=self.p.stoch_period)
+        rsi_ll = shared_indicator(Lowest, rsi, period=self.p.stoch_period)
+        knum = rsi - rsi_ll
         kden = rsi_hh - rsi_ll
 
         self.k = self.p.movav(100.0 * (knum / kden), period=self.p.k_period)
@@ -143,7 +265,7 @@ class StochasticRSI(Indicator):
         self.lines.fastd = self.d
 
 
-class CrossoverStochRSI(bt.Strategy):
+class CrossoverStochRSI(SharedIndicatorStrategy):
 
     params = (
         ("rsi_period", 14),
@@ -195,7 +317,7 @@ class CrossoverStochRSI(bt.Strategy):
                 )
 
 
-class TripleSupertrend(bt.Strategy):
+class TripleSupertrend(SharedIndicatorStrategy):
     params = (
         ("EMA_length", 200),
         ("ATR_fast_length", 10),
@@ -217,7 +339,9 @@ class TripleSupertrend(bt.Strategy):
         self.Supertrend_slow = SuperTrend(
             period=self.params.ATR_slow_length, multiplier=3
         )
-        self.EMA = bt.ind.EMA(period=self.params.EMA_length)
+        self.EMA = shared_indicator(
+            bt.ind.EMA, self.data, period=self.params.EMA_length
+        )
 
         # StochRSI indicator, sRSI is just SMA applied over rsi of length 14 + stoch
         self.stoch = StochasticRSI()
@@ -260,7 +384,7 @@ class TripleSupertrend(bt.Strategy):
                 )
 
 
-class MaCross(bt.Strategy):
+class MaCross(SharedIndicatorStrategy):
     params = (("fast_length", 50), ("slow_length", 200))
 
     def log(self, txt, dt=None):
@@ -269,10 +393,13 @@ class MaCross(bt.Strategy):
         print("%s, %s" % (dt.isoformat(), txt))
 
     def __init__(self):
-
-        self.ma_fast = bt.ind.SMA(period=self.params.fast_length)
-        self.ma_slow = bt.ind.SMA(period=self.params.slow_length)
-        self.EMA_1k = bt.ind.EMA(period=1000)
+        self.ma_fast = shared_indicator(
+            bt.ind.SMA, self.data, period=self.params.fast_length
+        )
+        self.ma_slow = shared_indicator(
+            bt.ind.SMA, self.data, period=self.params.slow_length
+        )
+        self.EMA_1k = shared_indicator(bt.ind.EMA, self.data, period=1000)
         self.rsi = bt.ind.RSI(upperband=80.0, lowerband=20.0)
         self.dataclose = self.datas[0].close
         self.crossover = bt.ind.CrossOver(self.ma_fast, self.ma_slow)
@@ -291,7 +418,7 @@ class MaCross(bt.Strategy):
             self.close()
 
 
-class TripleEMaStrategy(bt.Strategy):
+class TripleEMaStrategy(SharedIndicatorStrategy):
 
     params = (
         ("stop_loss", 0.05),
@@ -310,11 +437,17 @@ class TripleEMaStrategy(bt.Strategy):
         print("%s, %s" % (dt.isoformat(), txt))
 
     def __init__(self):
-        self.ma_fast = bt.ind.SMA(period=self.params.fast_length)
-        self.ma_mid = bt.ind.SMA(period=self.params.mid_length)
-        self.ma_slow = bt.ind.SMA(period=self.params.slow_length)
-        self.HMA1k = bt.ind.HMA(period=1000)
-        self.EMA1k = bt.ind.EMA(period=1000)
+        self.ma_fast = shared_indicator(
+            bt.ind.SMA, self.data, period=self.params.fast_length
+        )
+        self.ma_mid = shared_indicator(
+            bt.ind.SMA, self.data, period=self.params.mid_length
+        )
+        self.ma_slow = shared_indicator(
+            bt.ind.SMA, self.data, period=self.params.slow_length
+        )
+        self.HMA1k = shared_indicator(bt.ind.HMA, self.data, period=1000)
+        self.EMA1k = shared_indicator(bt.ind.EMA, self.data, period=1000)
         self.rsi = bt.ind.RelativeStrengthIndex()
         self.dataclose = self.datas[0].close
         self.crossover = bt.ind.CrossOver(self.ma_fast, self.ma_slow)
@@ -374,7 +507,7 @@ class TripleEMaStrategy(bt.Strategy):
             self.close()
 
 
-class MaCross(bt.Strategy):
+class MaCross(SharedIndicatorStrategy):
     params = (("fast_length", 50), ("slow_length", 200))
 
     def log(self, txt, dt=None):
@@ -383,10 +516,13 @@ class MaCross(bt.Strategy):
         print("%s, %s" % (dt.isoformat(), txt))
 
     def __init__(self):
-
-        self.ma_fast = bt.ind.SMA(period=self.params.fast_length)
-        self.ma_slow = bt.ind.SMA(period=self.params.slow_length)
-        self.EMA_1k = bt.ind.EMA(period=1000)
+        self.ma_fast = shared_indicator(
+            bt.ind.SMA, self.data, period=self.params.fast_length
+        )
+        self.ma_slow = shared_indicator(
+            bt.ind.SMA, self.data, period=self.params.slow_length
+        )
+        self.EMA_1k = shared_indicator(bt.ind.EMA, self.data, period=1000)
         self.rsi = bt.ind.RSI(upperband=80.0, lowerband=20.0)
         self.dataclose = self.datas[0].close
         self.crossover = bt.ind.CrossOver(self.ma_fast, self.ma_slow)
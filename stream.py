@@ -0,0 +1,227 @@
+"""Streaming backtests that checkpoint their state and resume on new bars.
+
+A stream session runs a strategy over the cached history once, in the
+bounded-memory mode of ``--low-memory``, and pickles the paused Cerebro
+with its strategy, indicators, broker and analyzers to a checkpoint file.
+The next session loads it and runs only the bars appended since, from the
+cache or from any iterable of bars, e.g. a live feed on a local socket:
+
+    python main.py --stream btc.ckpt --strategy TripleSupertrend
+    python main.py --stream btc.ckpt --listen 127.0.0.1:9999
+
+Every new bar costs one ``next`` of the strategy instead of a replay of
+the whole history.
+"""
+
+import argparse
+import datetime as dt
+import functools
+import json
+import os
+import pickle
+import socket
+import time
+
+import numpy as np
+
+from metrics import compute_metrics
+from price_cache import COLUMNS, DTYPES, last_closed_bar, to_millis
+from recorder import datenum_to_millis
+
+
+def bar_chunks(bars):
+    """One-bar chunks of column arrays from an iterable of bar dicts.
+
+    A bar dict holds the ``datetime`` (epoch ms) and the ``open``, ``high``,
+    ``low``, ``close`` and ``volume`` of a bar.
+    """
+    for bar in bars:
+        yield {
+            column: np.array([bar[column]], dtype=DTYPES[column]) for column in COLUMNS
+        }
+
+
+def socket_bars(host, port):
+    """Bar dicts sent as lines of JSON by a feed on host:port, until it closes"""
+    with socket.create_connection((host, port)) as sock:
+        with sock.makefile("r", encoding="utf-8") as lines:
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def serve_bars(arrays, host="127.0.0.1", port=9999, delay=0.0):
+    """Send the bars of column arrays to one client as lines of JSON.
+
+    A stand-in for a live feed, to drive ``--listen`` with cached bars.
+    """
+    with socket.create_server((host, port)) as server:
+        client, _ = server.accept()
+        with client, client.makefile("w", encoding="utf-8") as out:
+            for i in range(len(arrays["datetime"])):
+                bar = {column: arrays[column][i].item() for column in COLUMNS}
+                out.write(json.dumps(bar) + "\n")
+                out.flush()
+                if delay:
+                    time.sleep(delay)
+
+
+class StreamSession:
+    """A paused Cerebro run that goes on with new bars across processes"""
+
+    def __init__(self, cerebro, strategy_name, strategy_params, symbol, interval):
+        self.cerebro = cerebro
+        self.strategy_name = strategy_name
+        self.strategy_params = strategy_params
+        self.symbol = symbol
+        self.interval = interval
+
+    @classmethod
+    def start(cls, runner, chunks):
+        """Run runner's strategy over the chunks of a callable and pause.
+
+        The callable must pickle, e.g. a ``functools.partial`` of
+        ``PriceCache.iter_months``, as the data feed keeps it.
+        """
+        runner.setup_cerebro(chunks)
+        runner.cerebro.run()
+        return cls(
+            runner.cerebro,
+            runner.strategy_name,
+            runner.strategy_params,
+            runner.data_handler.symbol,
+            runner.data_handler.interval,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def save(self, path):
+        """Write the checkpoint, replacing the old one only once complete"""
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @property
+    def strategy(self):
+        return self.cerebro.runningstrats[0]
+
+    @property
+    def bars(self):
+        """Number of bars run so far"""
+        return len(self.strategy)
+
+    @property
+    def last_millis(self):
+        """Epoch ms of the last bar run, None before the first one"""
+        data = self.cerebro.datas[0]
+        if not len(data):
+            return None
+        return int(datenum_to_millis(data.datetime[0]))
+
+    @staticmethod
+    def _newer(chunks, last):
+        # Bars the run has already seen are dropped, so a feed may resend them
+        for chunk in chunks:
+            times = chunk["datetime"]
+            if last is not None:
+                lo = np.searchsorted(times, last, "right")
+                chunk = {column: chunk[column][lo:] for column in COLUMNS}
+            if len(chunk["datetime"]):
+                last = int(chunk["datetime"][-1])
+                yield chunk
+
+    def update(self, chunks):
+        """Run the bars of an iterable of chunks, returns the number run.
+
+        Mirrors the tail of ``Cerebro.runstrategies``: the strategies are
+        set back to their running stage, fed the new bars and stopped again.
+        """
+        cerebro = self.cerebro
+        before = self.bars
+        cerebro.datas[0].feed(self._newer(chunks, self.last_millis))
+        for strategy in cerebro.runningstrats:
+            strategy._stage2()
+        cerebro._runnext(cerebro.runningstrats)
+        for strategy in cerebro.runningstrats:
+            strategy._stop()
+        return self.bars - before
+
+    def get_metrics(self):
+        """Metrics of the run so far, as ``BacktestRunner.get_metrics``"""
+        metrics = compute_metrics(self.strategy.analyzers.equity.get_analysis())
+        return dict(metrics, final_value=self.cerebro.broker.getvalue())
+
+
+def run_stream(args):
+    from main import BacktestRunner, parse_params
+
+    runner = BacktestRunner(
+        argparse.Namespace(
+            # Extra timeframe feeds would not grow with the streamed bars
+            **dict(vars(args), low_memory=True, profile=False, timeframes=[])
+        ),
+        args.strategy_name,
+        parse_params(args.params),
+    )
+    handler = runner.data_handler
+    # Only closed bars go into the cache, the open one still changes
+    start, end = to_millis(handler.start_date), last_closed_bar(handler.interval)
+    # With --listen the live feed brings the new bars instead
+    if not args.listen:
+        handler.end_date = dt.datetime.fromtimestamp(end / 1000, dt.timezone.utc)
+        try:
+            handler.fetch_missing()
+        except Exception as e:
+            print("Could not fetch new bars, using the cache: %s" % e)
+    cache_bars = functools.partial(
+        handler.cache.iter_months, handler.symbol, handler.interval
+    )
+
+    started = time.perf_counter()
+    if os.path.exists(args.stream):
+        # The checkpoint's strategy and params win over the command line
+        session = StreamSession.load(args.stream)
+        print(
+            "Resuming %s after %d bars (loaded in %.0f ms)..."
+            % (
+                session.strategy_name,
+                session.bars,
+                (time.perf_counter() - started) * 1000,
+            )
+        )
+        started = time.perf_counter()
+        after = session.last_millis + 1 if session.bars else start
+        added = session.update(cache_bars(after, end))
+        print(
+            "Ran %d new cached bars in %.1f ms"
+            % (added, (time.perf_counter() - started) * 1000)
+        )
+    else:
+        print("Starting a %s stream over the cached history..." % args.strategy_name)
+        session = StreamSession.start(runner, functools.partial(cache_bars, start, end))
+        print("Ran %d bars in %.1fs" % (session.bars, time.perf_counter() - started))
+    session.save(args.stream)
+
+    if args.listen:
+        host, _, port = args.listen.rpartition(":")
+        print("Waiting for bars on %s..." % args.listen)
+        # One update and checkpoint per bar, so a crash loses at most one bar
+        for chunk in bar_chunks(socket_bars(host, int(port))):
+            started = time.perf_counter()
+            if session.update([chunk]):
+                session.save(args.stream)
+                print(
+                    "Bar %s ran and saved in %.1f ms"
+                    % (
+                        np.datetime64(session.last_millis, "ms"),
+                        (time.perf_counter() - started) * 1000,
+                    )
+                )
+
+    print("Checkpoint saved to %s" % args.stream)
+    runner.analyze_results(session.get_metrics())
+    return session
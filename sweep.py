@@ -0,0 +1,208 @@
+"""Parallel parameter sweeps over a single shared copy of the price data"""
+
+import contextlib
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# Price arrays of the current worker process, views on shared memory
+_worker_arrays = None
+_worker_shms = []
+
+
+class SharedPriceData:
+    """OHLCV arrays placed in shared memory so worker processes can map them.
+
+    The prices live in one (5, n) float64 block, one contiguous row per
+    column, and the open times in one int64 block of epoch ms. Workers get
+    column arrays that are views on those blocks, nothing is pickled or
+    copied per process.
+    """
+
+    def __init__(self, arrays):
+        self.length = len(arrays["datetime"])
+        values = np.stack([arrays[column] for column in OHLCV_COLUMNS])
+
+        self._values_shm = self._share(values.astype(np.float64, copy=False))
+        self._index_shm = self._share(np.asarray(arrays["datetime"], np.int64))
+
+    @staticmethod
+    def _share(array):
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        view[:] = array
+        return shm
+
+    @property
+    def spec(self):
+        """Picklable description workers use to attach to the blocks"""
+        return (self._values_shm.name, self._index_shm.name, self.length)
+
+    def close(self):
+        for shm in (self._values_shm, self._index_shm):
+            shm.close()
+            shm.unlink()
+
+    @staticmethod
+    def attach(spec):
+        """Map the blocks described by spec and return (arrays, shms).
+
+        The shared memory handles must stay referenced for as long as the
+        arrays are in use.
+        """
+        values_name, index_name, length = spec
+        values_shm = shared_memory.SharedMemory(name=values_name)
+        index_shm = shared_memory.SharedMemory(name=index_name)
+
+        values = np.ndarray((5, length), dtype=np.float64, buffer=values_shm.buf)
+        arrays = dict(zip(OHLCV_COLUMNS, values))
+        arrays["datetime"] = np.ndarray((length,), dtype=np.int64, buffer=index_shm.buf)
+        return arrays, [values_shm, index_shm]
+
+
+def _init_worker(spec):
+    global _worker_arrays, _worker_shms
+    _worker_arrays, _worker_shms = SharedPriceData.attach(spec)
+
+
+def _run_combination(args, strategy_name, params):
+    from main import BacktestRunner
+
+    runner = BacktestRunner(args, strategy_name, params)
+    runner.setup_cerebro(_worker_arrays)
+    # Keep the strategies' order logs out of the sweep's progress
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = runner.run_backtest()
+    return params, runner.get_metrics(results), runner.get_equity(results)
+
+
+def expand_grid(grid):
+    """Cartesian product of a {name: [values]} grid as a list of dicts"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def print_results(rows):
+    """Print sweep results, best total return first"""
+    rows = sorted(rows, key=lambda row: row[1]["total_return"], reverse=True)
+    print("\n--- Sweep Results ---")
+    for params, metrics in rows:
+        label = " ".join(f"{k}={v}" for k, v in params.items())
+        sharpe = metrics["sharpe"]
+        print(
+            "%-40s return %8.2f%%  drawdown %6.2f%%  winrate %6.2f%%  sharpe %s"
+            % (
+                label,
+                metrics["total_return"] * 100,
+                metrics["max_drawdown"],
+                metrics["winrate"] * 100,
+                "-" if sharpe is None else "%.3f" % sharpe,
+            )
+        )
+
+
+def vector_engine(strategy_name):
+    """The vectorized engine replaying strategy_name"""
+    import brackets
+    import prescreen
+
+    engines = {**prescreen.ENGINES, **brackets.ENGINES}
+    if strategy_name not in engines:
+        raise ValueError(f"No vectorized engine for strategy: {strategy_name}")
+    return engines[strategy_name]
+
+
+def prescreen_combinations(strategy_name, arrays, combinations, keep):
+    """Rank combinations with the vectorized engine, return the best keep"""
+    import prescreen
+
+    engine = vector_engine(strategy_name)
+    cache = prescreen.IndicatorCache(arrays)
+
+    print("Pre-screening %d combinations of %s..." % (len(combinations), strategy_name))
+    scores = [
+        engine(arrays, cache=cache, **params).total_return for params in combinations
+    ]
+    order = sorted(range(len(combinations)), key=lambda i: scores[i], reverse=True)
+    return [combinations[i] for i in order[:keep]]
+
+
+def split_stored(args, arrays, combinations, store):
+    """Split combinations into stored (params, metrics) rows and runs to do.
+
+    The runs to do are (params, key, info) tuples, ready for store.put.
+    """
+    from main import BacktestRunner
+    from result_store import data_fingerprint
+
+    data_info = data_fingerprint([arrays])
+    rows, pending = [], []
+    for params in combinations:
+        runner = BacktestRunner(args, args.strategy_name, params)
+        runner.setup_cerebro(arrays)
+        key = runner.run_key(data_info[0])
+        metrics = None if args.rerun else store.get(key)
+        if metrics is None:
+            pending.append((params, key, runner.run_info(data_info)))
+        else:
+            rows.append((params, metrics))
+    return rows, pending
+
+
+def run_sweep(args):
+    from main import DataHandler, parse_grid
+    from result_store import ResultStore
+
+    combinations = expand_grid(parse_grid(args.params))
+    arrays = DataHandler(compact=args.compact).load_or_fetch_arrays()
+
+    if args.prescreen:
+        combinations = prescreen_combinations(
+            args.strategy_name, arrays, combinations, args.prescreen
+        )
+
+    # Workers never plot or profile, only the metrics are sent back
+    args.plot = args.save_plot = args.profile = False
+
+    store = ResultStore(args.results) if args.results else None
+    if store is None:
+        rows, pending = [], [(params, None, None) for params in combinations]
+    else:
+        rows, pending = split_stored(args, arrays, combinations, store)
+        if rows:
+            print("%d combinations found in the result store" % len(rows))
+
+    workers = args.workers or os.cpu_count()
+    print(
+        "Sweeping %d combinations of %s on %d workers..."
+        % (len(pending), args.strategy_name, workers)
+    )
+
+    shared = SharedPriceData(arrays)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(shared.spec,)
+        ) as pool:
+            futures = {}
+            for params, key, info in pending:
+                future = pool.submit(_run_combination, args, args.strategy_name, params)
+                futures[future] = key, info
+            for done, future in enumerate(as_completed(futures), 1):
+                params, metrics, equity = future.result()
+                key, info = futures[future]
+                if store is not None:
+                    store.put(key, info, metrics, equity)
+                rows.append((params, metrics))
+                print("  %d/%d done" % (done, len(pending)))
+    finally:
+        shared.close()
+        if store is not None:
+            store.close()
+
+    print_results(rows)
+    return rows
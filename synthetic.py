@@ -0,0 +1,49 @@
+"""Seeded synthetic OHLCV bars for benchmarks and offline runs"""
+
+import datetime as dt
+
+import numpy as np
+
+from price_cache import interval_millis, to_millis
+
+
+def synthetic_bars(
+    bars,
+    interval="1h",
+    seed=0,
+    start=dt.datetime(2019, 1, 1),
+    price=10_000.0,
+    volatility=0.8,
+    drift=0.0,
+):
+    """Generate bars of a geometric Brownian motion price path.
+
+    Returns column arrays in the layout of ``PriceCache.read``. The yearly
+    ``volatility`` and ``drift`` are scaled to the bar interval, every bar
+    opens at the previous close and its high and low extend past the body
+    by a random wick. The same seed always yields the same bars.
+    """
+    rng = np.random.default_rng(seed)
+    step = interval_millis(interval)
+    years = step / (365.0 * 86_400_000)
+    sigma = volatility * np.sqrt(years)
+
+    returns = rng.normal((drift - 0.5 * volatility**2) * years, sigma, bars)
+    close = price * np.exp(np.cumsum(returns))
+    open_ = np.empty(bars)
+    open_[0] = price
+    open_[1:] = close[:-1]
+
+    wicks = np.abs(rng.normal(0.0, 0.5 * sigma, (2, bars)))
+    high = np.maximum(open_, close) * (1.0 + wicks[0])
+    low = np.minimum(open_, close) * (1.0 - wicks[1])
+    volume = rng.lognormal(3.0, 1.0, bars)
+
+    return {
+        "datetime": to_millis(start) + step * np.arange(bars, dtype=np.int64),
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": volume,
+    }
@@ -0,0 +1,113 @@
+"""DataHandler refreshes of the price cache against a fake exchange"""
+
+import datetime as dt
+
+import numpy as np
+import pytest
+
+from main import DataHandler
+from price_cache import from_millis, last_closed_bar
+from synthetic import synthetic_bars
+
+START = dt.datetime(2021, 1, 1)
+
+
+class FakeExchange:
+    """Serves kline rows of arrays, with the bars of outages left out"""
+
+    def __init__(self, arrays, outage=()):
+        keep = ~np.isin(np.arange(len(arrays["datetime"])), outage)
+        self.arrays = {column: values[keep] for column, values in arrays.items()}
+        self.requests = []
+
+    def fetch(self, symbol, interval, start, end):
+        self.requests.append((start, end))
+        times = self.arrays["datetime"]
+        rows = np.flatnonzero((times >= start) & (times <= end))
+        columns = ("open", "high", "low", "close", "volume")
+        return [
+            [int(times[i])] + [str(self.arrays[c][i]) for c in columns] for i in rows
+        ]
+
+
+class Offline:
+    def fetch(self, symbol, interval, start, end):
+        raise ConnectionError("exchange unreachable")
+
+
+@pytest.fixture
+def bars():
+    return synthetic_bars(2000, start=START)
+
+
+def handler(tmp_path, downloader, end):
+    return DataHandler(
+        str(tmp_path), start_date=START, end_date=end, downloader=downloader
+    )
+
+
+def test_outage_is_fetched_once(tmp_path, bars):
+    exchange = FakeExchange(bars, outage=range(700, 705))
+    end = START + dt.timedelta(hours=1999)
+
+    first = handler(tmp_path, exchange, end).load_or_fetch_arrays()
+    assert len(first["datetime"]) == 1995
+    requests = len(exchange.requests)
+
+    again = handler(tmp_path, exchange, end).load_or_fetch_arrays()
+    assert len(exchange.requests) == requests
+    np.testing.assert_array_equal(again["close"], first["close"])
+
+
+def test_tail_is_retried(tmp_path, bars):
+    exchange = FakeExchange({c: v[:1500] for c, v in bars.items()})
+    end = START + dt.timedelta(hours=1999)
+    handler(tmp_path, exchange, end).load_or_fetch_arrays()
+
+    # Bars the exchange did not have yet are asked for on the next run
+    exchange.arrays = bars
+    arrays = handler(tmp_path, exchange, end).load_or_fetch_arrays()
+    assert len(arrays["datetime"]) == 2000
+
+
+def test_offline_uses_the_cache(tmp_path, bars, capsys):
+    cached = {c: np.delete(v, range(700, 705)) for c, v in bars.items()}
+    DataHandler(str(tmp_path)).cache.write("BTCUSDT", "1h", cached)
+    end = START + dt.timedelta(hours=1999)
+
+    arrays = handler(tmp_path, Offline(), end).load_or_fetch_arrays()
+    assert len(arrays["datetime"]) == 1995
+    assert "exchange unreachable" in capsys.readouterr().out
+
+
+def test_offline_resamples_the_cached_base(tmp_path, bars, capsys):
+    # The base bars after the cached ones cannot be fetched
+    cached = {c: v[:1800] for c, v in bars.items()}
+    DataHandler(str(tmp_path)).cache.write("BTCUSDT", "1h", cached)
+    resampled = DataHandler(
+        str(tmp_path),
+        interval="4h",
+        start_date=START,
+        end_date=START + dt.timedelta(hours=1999),
+        downloader=Offline(),
+        base_interval="1h",
+    )
+
+    arrays = resampled.load_or_fetch_arrays()
+    assert len(arrays["datetime"]) == 450
+    assert arrays["high"][0] == bars["high"][:4].max()
+    assert "exchange unreachable" in capsys.readouterr().out
+
+
+def test_forming_bar_is_not_fetched(tmp_path):
+    now = dt.datetime.now(dt.timezone.utc)
+    start = from_millis(last_closed_bar("1h")) - dt.timedelta(hours=50)
+    # The exchange already serves the bar still forming
+    exchange = FakeExchange(synthetic_bars(60, start=start.replace(tzinfo=None)))
+    refresh = DataHandler(
+        str(tmp_path), start_date=start, end_date=now, downloader=exchange
+    )
+    refresh.fetch_missing()
+
+    assert max(end for _, end in exchange.requests) <= last_closed_bar("1h")
+    assert refresh.read_cached()["datetime"][-1] == last_closed_bar("1h")
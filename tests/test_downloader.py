@@ -0,0 +1,123 @@
+"""KlineDownloader against a local stand-in for the Binance klines endpoint"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pytest
+
+from downloader import KlineDownloader, parse_klines
+from price_cache import interval_millis
+from synthetic import synthetic_bars
+
+
+class StandIn(ThreadingHTTPServer):
+    """Serves the klines of arrays, after the scripted failures in errors"""
+
+    def __init__(self, arrays):
+        super().__init__(("127.0.0.1", 0), KlineHandler)
+        self.arrays = arrays
+        # (status, headers) answered to the next requests, in order
+        self.errors = []
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d" % self.server_port
+
+
+class KlineHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(time.monotonic())
+            error = server.errors.pop(0) if server.errors else None
+        if error is not None:
+            status, headers = error
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        times = server.arrays["datetime"]
+        rows = np.flatnonzero(
+            (times >= int(query["startTime"])) & (times <= int(query["endTime"]))
+        )[: int(query["limit"])]
+        columns = ("open", "high", "low", "close", "volume")
+        body = json.dumps(
+            [
+                [int(times[i])] + [repr(float(server.arrays[c][i])) for c in columns]
+                for i in rows
+            ]
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def bars():
+    return synthetic_bars(5000)
+
+
+@pytest.fixture
+def server(bars):
+    server = StandIn(bars)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def fetch_all(downloader, bars):
+    times = bars["datetime"]
+    return downloader.fetch("BTCUSDT", "1h", int(times[0]), int(times[-1]))
+
+
+def test_pages_reassembled_in_order(server, bars):
+    downloader = KlineDownloader(server.url, workers=8, limit=100, backoff=0.01)
+    rows = fetch_all(downloader, bars)
+
+    assert len(server.requests) == 50
+    arrays = parse_klines(rows)
+    np.testing.assert_array_equal(arrays["datetime"], bars["datetime"])
+    np.testing.assert_array_equal(arrays["close"], bars["close"])
+
+
+def test_retry_after_and_server_errors(server, bars):
+    server.errors = [
+        (429, {"Retry-After": "0.3"}),
+        (503, {}),
+    ]
+    downloader = KlineDownloader(server.url, workers=1, limit=1000, backoff=0.05)
+    started = time.monotonic()
+    rows = fetch_all(downloader, bars)
+
+    times = [row[0] for row in rows]
+    assert times == sorted(set(times)) and len(times) == 5000
+    # 5 pages and the 2 failed attempts, the first held back by Retry-After
+    assert len(server.requests) == 7
+    assert server.requests[1] - server.requests[0] >= 0.3
+    assert server.requests[2] - server.requests[1] >= 0.05
+    assert time.monotonic() - started >= 0.35
+
+
+def test_gives_up_after_max_retries(server, bars):
+    server.errors = [(503, {})] * 10
+    downloader = KlineDownloader(server.url, workers=1, max_retries=2, backoff=0.01)
+    start = int(bars["datetime"][0])
+    with pytest.raises(RuntimeError, match="after 2 retries"):
+        downloader.fetch_page("BTCUSDT", "1h", start, start + interval_millis("1h"))
+    assert len(server.requests) == 3
@@ -0,0 +1,61 @@
+"""Vectorized engines against Cerebro runs of the same strategies"""
+
+import argparse
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+import brackets
+import prescreen
+from main import BacktestRunner
+from synthetic import synthetic_bars
+
+ENGINES = dict(prescreen.ENGINES, **brackets.ENGINES)
+
+CASES = [
+    ("MaCross", {}),
+    ("MaCross", {"fast_length": 20, "slow_length": 100}),
+    ("TripleEMaStrategy", {}),
+    ("TripleEMaStrategy", {"fast_length": 20, "mid_length": 100, "slow_length": 300}),
+    ("CrossoverStochRSI", {}),
+    ("CrossoverStochRSI", {"take_profit": 0.05, "stop_loss": 0.03}),
+    ("TripleSupertrend", {}),
+    ("TripleSupertrend", {"EMA_length": 100, "ATR_slow_length": 14}),
+]
+
+
+@pytest.fixture(scope="module")
+def arrays():
+    return synthetic_bars(6000, seed=7)
+
+
+def run_cerebro(arrays, name, params):
+    args = argparse.Namespace(
+        plot=False,
+        save_plot=False,
+        profile=False,
+        low_memory=False,
+        timeframes=[],
+        compact=False,
+    )
+    runner = BacktestRunner(args, name, params)
+    runner.setup_cerebro(arrays)
+    # Keep the strategies' order logs out of the test output
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = runner.run_backtest()
+    return results[0]
+
+
+@pytest.mark.parametrize("name, params", CASES)
+def test_engine_matches_cerebro(arrays, name, params):
+    strategy = run_cerebro(arrays, name, params)
+    analysis = strategy.analyzers.equity.get_analysis()
+    result = ENGINES[name](arrays, **params)
+
+    assert len(analysis["trades"]) > 0
+    assert len(result.closed_trades) == len(analysis["trades"])
+    assert result.final_value == pytest.approx(strategy.broker.getvalue(), rel=1e-12)
+    assert len(result.equity) == len(analysis["value"]) == len(arrays["close"])
+    assert np.allclose(result.equity, analysis["value"], rtol=1e-12, atol=0.0)
@@ -0,0 +1,38 @@
+"""Array feeds under exactbars, with several strategies on one cerebro"""
+
+import backtrader as bt
+import pytest
+
+from feeds import ArrayData, ChunkedArrayData
+from synthetic import synthetic_bars
+
+
+class Averages(bt.Strategy):
+    params = (("period", 14),)
+
+    def __init__(self):
+        self.sma = bt.indicators.SMA(self.data.close, period=self.p.period)
+        self.values = []
+
+    def next(self):
+        self.values.append(self.sma[0])
+
+
+def run(bars, periods, exactbars):
+    cerebro = bt.Cerebro(exactbars=exactbars, stdstats=False)
+    if exactbars:
+        cerebro.adddata(ChunkedArrayData(dataname=lambda: [bars]))
+    else:
+        cerebro.adddata(ArrayData(dataname=bars))
+    for period in periods:
+        cerebro.addstrategy(Averages, period=period)
+    return [strategy.values for strategy in cerebro.run()]
+
+
+@pytest.mark.parametrize("periods", [(200, 14), (14, 200)])
+def test_several_strategies_under_exactbars(periods):
+    bars = synthetic_bars(1000, seed=2)
+    expected = run(bars, periods, exactbars=False)
+    actual = run(bars, periods, exactbars=1)
+    assert [len(values) for values in actual] == [1000 - p + 1 for p in periods]
+    assert actual == expected
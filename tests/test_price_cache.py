@@ -0,0 +1,109 @@
+"""Compact price cache against a plain one"""
+
+import argparse
+import contextlib
+import io
+import os
+
+import numpy as np
+import pytest
+
+from main import STRATEGIES, BacktestRunner
+from price_cache import COLUMNS, PriceCache, compact_decimals
+from resample import ResampledCache
+from synthetic import synthetic_bars
+
+
+@pytest.fixture(scope="module")
+def bars():
+    # Quoted like Binance klines: prices in cents, volumes to 5 places
+    arrays = synthetic_bars(5000, seed=3, price=30_000.0)
+    return dict(
+        arrays,
+        **{column: np.round(arrays[column], 2) for column in COLUMNS[1:5]},
+        volume=np.round(arrays["volume"], 5),
+    )
+
+
+@pytest.fixture(scope="module")
+def caches(bars, tmp_path_factory):
+    root = tmp_path_factory.mktemp("caches")
+    plain = PriceCache(str(root / "plain"))
+    compact = PriceCache(str(root / "compact"), compact=True)
+    for cache in (plain, compact):
+        cache.write("BTCUSDT", "1h", bars)
+    return plain, compact
+
+
+def stored_dtypes(cache, symbol, interval):
+    month = cache.months(symbol, interval)[0]
+    arrays, decimals = cache._load_month(symbol, interval, month)
+    return {column: arrays[column].dtype for column in COLUMNS}, decimals
+
+
+def test_compact_read_is_exact(bars, caches):
+    plain, compact = caches
+    dtypes, decimals = stored_dtypes(compact, "BTCUSDT", "1h")
+    assert all(dtypes[column] == np.float32 for column in COLUMNS[1:5])
+    assert decimals["close"] == 2
+
+    expected = plain.read("BTCUSDT", "1h")
+    actual = compact.read("BTCUSDT", "1h")
+    for column in COLUMNS:
+        assert actual[column].dtype == expected[column].dtype
+        np.testing.assert_array_equal(actual[column], expected[column])
+        np.testing.assert_array_equal(actual[column], bars[column])
+
+
+def test_resampled_volume_stays_float64(caches):
+    _, compact = caches
+    resampled = ResampledCache(compact, "1h")
+    times = compact.read("BTCUSDT", "1h")["datetime"]
+    resampled.derive_missing("BTCUSDT", "4h", int(times[0]), int(times[-1]))
+
+    dtypes, decimals = stored_dtypes(resampled, "BTCUSDT", "4h")
+    assert dtypes["close"] == np.float32
+    # Sums of 5 place volumes are not 5 place decimals in float64
+    assert dtypes["volume"] == np.float64
+    assert decimals["volume"] == -1
+    assert compact_decimals(np.array([0.1 + 0.2])) is None
+
+
+def test_convert_round_trips(bars, tmp_path):
+    cache = PriceCache(str(tmp_path))
+    cache.write("BTCUSDT", "1h", bars)
+    compact = PriceCache(str(tmp_path), compact=True)
+    months = len(cache.months("BTCUSDT", "1h"))
+
+    assert compact.convert("BTCUSDT", "1h") == months
+    assert compact.convert("BTCUSDT", "1h") == 0
+    month = cache.months("BTCUSDT", "1h")[0]
+    assert os.path.exists(tmp_path / "BTCUSDT" / "1h" / month / "decimals.npy")
+    assert cache.convert("BTCUSDT", "1h") == months
+    actual = cache.read("BTCUSDT", "1h")
+    for column in COLUMNS:
+        np.testing.assert_array_equal(actual[column], bars[column])
+
+
+@pytest.mark.parametrize("name", list(STRATEGIES))
+def test_strategies_trade_the_same(caches, name):
+    args = argparse.Namespace(
+        plot=False,
+        save_plot=False,
+        profile=False,
+        low_memory=False,
+        timeframes=[],
+        compact=False,
+    )
+    runs = []
+    for cache in caches:
+        runner = BacktestRunner(args, name)
+        runner.setup_cerebro(cache.read("BTCUSDT", "1h"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            strategy = runner.run_backtest()[0]
+        runs.append(strategy.analyzers.equity.get_analysis())
+
+    plain, compact = runs
+    assert len(plain["trades"]) > 0
+    np.testing.assert_array_equal(compact["trades"], plain["trades"])
+    np.testing.assert_array_equal(compact["value"], plain["value"])
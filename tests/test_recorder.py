@@ -0,0 +1,84 @@
+"""Metrics of a --low-memory run, which folds its curve, against a normal run"""
+
+import argparse
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from main import STRATEGIES, BacktestRunner
+from metrics import (
+    RunningCurve,
+    annual_return,
+    curve_metrics,
+    max_drawdown,
+    sharpe_ratio,
+    sortino_ratio,
+)
+from synthetic import synthetic_bars
+
+
+@pytest.fixture(scope="module")
+def bars():
+    # Over a year end, so the Sharpe ratio has yearly returns
+    return synthetic_bars(10000, seed=5)
+
+
+def run(bars, name, low_memory):
+    args = argparse.Namespace(
+        plot=False,
+        save_plot=False,
+        profile=False,
+        low_memory=low_memory,
+        timeframes=[],
+        compact=False,
+    )
+    runner = BacktestRunner(args, name)
+    runner.setup_cerebro((lambda: [bars]) if low_memory else bars)
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = runner.run_backtest()
+    return runner, results
+
+
+@pytest.mark.parametrize("name", list(STRATEGIES))
+def test_folded_curve_metrics(bars, name):
+    runner, results = run(bars, name, low_memory=False)
+    expected = runner.get_metrics(results)
+    assert runner.get_equity(results) is not None
+
+    runner, results = run(bars, name, low_memory=True)
+    analysis = results[0].analyzers.equity.get_analysis()
+    assert analysis["curve"].bars == len(bars["close"])
+    assert len(analysis["value"]) == 0
+    assert runner.get_equity(results) is None
+
+    actual = runner.get_metrics(results)
+    assert expected["sharpe"] is not None
+    for key, value in expected.items():
+        if key == "sortino":
+            assert actual[key] == pytest.approx(value, rel=1e-12)
+        else:
+            assert actual[key] == value, key
+
+
+@pytest.mark.parametrize("bars", [1, 2, 7, 2000])
+def test_running_curve_matches_arrays(bars):
+    rng = np.random.default_rng(bars)
+    # Uneven gaps across year ends, for the median spacing
+    gaps = rng.choice([3_600_000, 7_200_000, 14_400_000], size=bars)
+    datetime = 1_546_300_800_000 + np.cumsum(gaps) * 20
+    value = 10_000.0 * np.cumprod(1.0 + rng.normal(0.0, 0.01, size=bars))
+    curve = RunningCurve(10_000.0)
+    for millis, v in zip(datetime.tolist(), value.tolist()):
+        curve.add(millis, v)
+
+    metrics = curve_metrics(curve)
+    assert metrics["max_drawdown"] == max_drawdown(value)
+    assert metrics["sharpe"] == sharpe_ratio(datetime, value, 10_000.0)
+    assert metrics["annual_return"] == annual_return(datetime, value, 10_000.0)
+    expected = sortino_ratio(datetime, value, 10_000.0)
+    if expected is None:
+        assert metrics["sortino"] is None
+    else:
+        assert metrics["sortino"] == pytest.approx(expected, rel=1e-12)
@@ -0,0 +1,43 @@
+"""Result store keys and stored results of older versions"""
+
+import argparse
+import contextlib
+import inspect
+import io
+
+import metrics
+import result_store
+from main import BacktestRunner
+from strategies import MaCross
+
+
+def test_key_covers_result_modules(monkeypatch):
+    key = result_store.run_key(MaCross, {}, {}, "data")
+    assert result_store.run_key(MaCross, {}, {}, "data") == key
+
+    getsource = inspect.getsource
+
+    def edited(module):
+        source = getsource(module)
+        return source + "\n# edited\n" if module is metrics else source
+
+    monkeypatch.setattr(inspect, "getsource", edited)
+    assert result_store.run_key(MaCross, {}, {}, "data") != key
+
+
+def test_analyze_older_metrics():
+    args = argparse.Namespace(low_memory=False, compact=False)
+    runner = BacktestRunner(args, "MaCross")
+    # Stored before the Sortino and Calmar ratios and exposure were added
+    stored = {
+        "final_value": 1200.0,
+        "winrate": 0.5,
+        "sharpe": None,
+        "max_drawdown": 12.5,
+        "total_return": 0.18,
+    }
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        runner.analyze_results(stored)
+    assert "Sortino Ratio: None" in out.getvalue()
+    assert "Exposure" not in out.getvalue()
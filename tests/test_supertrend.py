@@ -0,0 +1,52 @@
+"""SuperTrend's vectorized once() against its bar by bar next()"""
+
+import backtrader as bt
+import numpy as np
+import pytest
+
+from feeds import ArrayData
+from strategies import SuperTrend
+from synthetic import synthetic_bars
+
+
+class SuperTrends(bt.Strategy):
+    params = (("pairs", ()),)
+
+    def __init__(self):
+        self.trends = [
+            SuperTrend(period=period, multiplier=multiplier)
+            for period, multiplier in self.p.pairs
+        ]
+
+
+def run_lines(arrays, pairs, runonce):
+    cerebro = bt.Cerebro(runonce=runonce, stdstats=False)
+    cerebro.adddata(ArrayData(dataname=arrays))
+    cerebro.addstrategy(SuperTrends, pairs=pairs)
+    strategy = cerebro.run()[0]
+    bars = len(strategy)
+    return [
+        {
+            name: np.array(line.array[:bars])
+            for name, line in (
+                ("super_trend", trend.l.super_trend),
+                ("final_ub", trend.stb.l.final_ub),
+                ("final_lb", trend.stb.l.final_lb),
+            )
+        }
+        for trend in strategy.trends
+    ]
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_once_matches_next(seed):
+    arrays = synthetic_bars(3000, seed=seed)
+    pairs = ((10, 1), (11, 2), (7, 3))
+    vectorized = run_lines(arrays, pairs, runonce=True)
+    stepped = run_lines(arrays, pairs, runonce=False)
+
+    for once_lines, next_lines in zip(vectorized, stepped):
+        for name, values in next_lines.items():
+            assert len(values) == len(arrays["close"])
+            assert np.isfinite(values[100:]).all()
+            np.testing.assert_array_equal(once_lines[name], values, err_msg=name)
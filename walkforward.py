@@ -0,0 +1,144 @@
+"""Walk-forward optimization on rolling in-sample/out-of-sample windows.
+
+The series is cut into windows of ``train`` in-sample bars followed by
+``test`` out-of-sample bars, rolled forward by ``test`` bars. Every
+parameter combination is scored on the in-sample bars, the best one
+trades the out-of-sample bars with the equity the previous window ended
+with, and the out-of-sample pieces are stitched into one equity curve.
+
+All runs go through the vectorized engines of ``prescreen.py`` and
+``brackets.py`` on a single ``IndicatorCache`` of the full history, so
+each indicator is computed once and every window starts with warmed up
+indicators instead of rebuilding them from scratch.
+"""
+
+import time
+
+import numpy as np
+
+from fastind import IndicatorCache
+from metrics import compute_metrics
+from recorder import TRADE_DTYPE
+
+ROW_FORMAT = "%-10s %-10s %-10s %9s %9s  %s"
+
+
+def rolling_windows(bars, train, test):
+    """(train_begin, test_begin, test_end) bar indices of every window.
+
+    The last out-of-sample window may be shorter than test.
+    """
+    if train <= 0 or test <= 0:
+        raise ValueError("Window lengths must be positive")
+    windows = []
+    for begin in range(0, bars - train, test):
+        windows.append((begin, begin + train, min(begin + train + test, bars)))
+    return windows
+
+
+def _closed_trades(result):
+    """Trades closed within a windowed run, as recorder TRADE_DTYPE records"""
+    trades = result.closed_trades
+    records = np.empty(len(trades), dtype=TRADE_DTYPE)
+    records["pnl"] = records["pnlcomm"] = trades["pnl"]
+    records["bars"] = trades["exit_bar"] - trades["entry_bar"]
+    return records
+
+
+def walk_forward(engine, arrays, combinations, train, test, cash=1000.0):
+    """Optimize on every in-sample window and trade the next test bars.
+
+    Returns the per-window rows and the EquityRecorder-like analysis of the
+    stitched out-of-sample run. A position still open at the end of a
+    window is valued at its last close and not carried over.
+    """
+    cache = IndicatorCache(arrays)
+    rows, curves, trades = [], [], []
+    value = cash
+    for train_begin, test_begin, test_end in rolling_windows(
+        len(arrays["close"]), train, test
+    ):
+        scores = [
+            engine(
+                arrays, cache=cache, begin=train_begin, end=test_begin, **params
+            ).total_return
+            for params in combinations
+        ]
+        best = int(np.argmax(scores))
+        params = combinations[best]
+
+        result = engine(
+            arrays, cache=cache, begin=test_begin, end=test_end, cash=value, **params
+        )
+        curves.append(result.equity[test_begin:test_end])
+        trades.append(_closed_trades(result))
+        rows.append(
+            {
+                "train_begin": train_begin,
+                "test_begin": test_begin,
+                "test_end": test_end,
+                "params": params,
+                "in_sample": scores[best],
+                "out_of_sample": result.total_return,
+            }
+        )
+        value = result.final_value
+
+    first = rows[0]["test_begin"] if rows else len(arrays["close"])
+    analysis = {
+        "datetime": np.asarray(arrays["datetime"][first:], dtype=np.int64),
+        "value": np.concatenate(curves) if curves else np.empty(0),
+        "start_value": cash,
+        "trades": np.concatenate(trades) if trades else np.empty(0, TRADE_DTYPE),
+    }
+    return rows, analysis
+
+
+def print_windows(rows, datetime):
+    """Print the chosen params and returns of every window"""
+    print("\n--- Walk-Forward Windows ---")
+    print(ROW_FORMAT % ("train", "test", "until", "IS", "OOS", "params"))
+    day = datetime.astype("datetime64[ms]").astype("datetime64[D]").astype(str)
+    for row in rows:
+        print(
+            ROW_FORMAT
+            % (
+                day[row["train_begin"]],
+                day[row["test_begin"]],
+                day[row["test_end"] - 1],
+                "%.2f%%" % (row["in_sample"] * 100),
+                "%.2f%%" % (row["out_of_sample"] * 100),
+                " ".join(f"{k}={v}" for k, v in row["params"].items()),
+            )
+        )
+
+
+def run_walk_forward(args):
+    from main import BacktestRunner, parse_grid
+    from sweep import expand_grid, vector_engine
+
+    runner = BacktestRunner(args, args.strategy_name)
+    engine = vector_engine(args.strategy_name)
+    combinations = expand_grid(parse_grid(args.params))
+    arrays = runner.data_handler.load_or_fetch_arrays()
+
+    print(
+        "Walk-forward over %d combinations of %s, %d in-sample and %d "
+        "out-of-sample bars per window..."
+        % (len(combinations), args.strategy_name, args.train_bars, args.test_bars)
+    )
+    started = time.perf_counter()
+    rows, analysis = walk_forward(
+        engine, arrays, combinations, args.train_bars, args.test_bars
+    )
+    if not rows:
+        print("The series is too short for a single window")
+        return rows
+    print_windows(rows, np.asarray(arrays["datetime"]))
+
+    metrics = compute_metrics(analysis)
+    metrics["final_value"] = float(analysis["value"][-1])
+    print("\n--- Stitched Out-of-Sample Run ---")
+    runner.analyze_results(metrics)
+    print("\nFinished %d windows in %.1fs" % (len(rows), time.perf_counter() - started))
+    return rows